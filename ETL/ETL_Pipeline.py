@@ -1,6 +1,7 @@
 from ETL.extract import extract_from_mongodb
 from ETL.transform import transform_data
 from ETL.load import create_tables_and_Load_data
+from ETL.profiling import start_run, finish_run, profile_stage
 from dotenv import load_dotenv
 import os
 
@@ -8,21 +9,29 @@ def main():
     # Step 1: Load environment variables
     load_dotenv()
 
-    # Step 2: Extract raw data from MongoDB
-    print(" Extracting data from MongoDB...")
-    raw_data = extract_from_mongodb()
-    if raw_data is None:
-        print(" Extraction failed. Stopping the pipeline.")
-        return
+    # Per-stage time, memory and row counts go to a JSON report in PIPELINE_REPORT_DIR
+    start_run("etl")
+    try:
+        # Step 2: Extract raw data from MongoDB
+        print(" Extracting data from MongoDB...")
+        raw_data = extract_from_mongodb()
+        if raw_data is None:
+            print(" Extraction failed. Stopping the pipeline.")
+            return
 
-    # Step 3: Transform raw data
-    print(" Transforming extracted data...")
-    transformed_data = transform_data(raw_data)
+        # Step 3: Transform raw data
+        print(" Transforming extracted data...")
+        with profile_stage("transform") as stage:
+            transformed_data = transform_data(raw_data)
+            stage["rows_out"] = sum(len(df) for df in transformed_data.values())
 
-    # step 4: Load transformed data into PostgreSQL
-    print(" Loading transformed data into PostgreSQL...")
-    create_tables_and_Load_data(transformed_data)
-    print(" ETL pipeline completed successfully.")
+        # step 4: Load transformed data into PostgreSQL
+        print(" Loading transformed data into PostgreSQL...")
+        with profile_stage("load"):
+            create_tables_and_Load_data(transformed_data)
+        print(" ETL pipeline completed successfully.")
+    finally:
+        finish_run()
 
 if __name__ == "__main__":
     main()
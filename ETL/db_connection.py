@@ -0,0 +1,235 @@
+from sqlalchemy import create_engine, event
+from contextlib import contextmanager
+import threading
+import psycopg2
+import time
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool settings, overridable per deployment / per parallel job
+POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("POSTGRES_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("POSTGRES_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("POSTGRES_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+class PoolMetrics:
+    """
+    Thread-safe counters for connection pool usage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.waits = 0
+            self.wait_time_total = 0.0
+            self.wait_time_max = 0.0
+
+    def record(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.wait_time_total += seconds
+            self.wait_time_max = max(self.wait_time_max, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "in_use": self.checkouts - self.checkins,
+                "wait_time_total_s": round(self.wait_time_total, 4),
+                "wait_time_avg_ms": round(1000 * self.wait_time_total / self.waits, 3) if self.waits else 0.0,
+                "wait_time_max_ms": round(1000 * self.wait_time_max, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+def get_connection_params(db_name=None):
+    """
+    Reads PostgreSQL connection parameters from environment variables.
+
+    Args:
+        db_name (str): Database to connect to. Defaults to POSTGRES_DB.
+
+    Returns:
+        dict: psycopg2-style connection keyword arguments.
+    """
+    return {
+        "user": os.getenv("POSTGRES_USER"),
+        "password": os.getenv("POSTGRES_PASSWORD"),
+        "host": os.getenv("POSTGRES_HOST"),
+        "port": os.getenv("POSTGRES_PORT"),
+        "dbname": db_name or os.getenv("POSTGRES_DB"),
+    }
+
+
+def get_db_uri(db_name=None):
+    """
+    Builds the SQLAlchemy database URI from environment variables.
+
+    Args:
+        db_name (str): Database to connect to. Defaults to POSTGRES_DB.
+
+    Returns:
+        str: PostgreSQL connection URI.
+    """
+    params = get_connection_params(db_name)
+    return (f"postgresql://{params['user']}:{params['password']}@"
+            f"{params['host']}:{params['port']}/{params['dbname']}")
+
+
+def get_engine():
+    """
+    Returns the shared SQLAlchemy engine, creating it on first use.
+
+    No connection is opened until a query runs, so importing modules that use
+    the engine is free. A forked worker process gets its own engine instead of
+    reusing the parent's pooled sockets.
+
+    Returns:
+        sqlalchemy.engine.Engine: Pooled engine for POSTGRES_DB.
+    """
+    global _engine, _engine_pid
+
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            if _engine is not None:
+                # Inherited from the parent: drop its pool without closing sockets
+                # the parent is still using (close=False only discards the references)
+                _engine.dispose(close=False)
+            _engine = create_engine(
+                get_db_uri(),
+                pool_size=POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+                pool_timeout=POOL_TIMEOUT,
+                pool_recycle=POOL_RECYCLE,
+                pool_pre_ping=POOL_PRE_PING,
+            )
+            _engine_pid = os.getpid()
+            event.listen(_engine, "connect", lambda *args: pool_metrics.record("connects"))
+            event.listen(_engine, "checkout", lambda *args: pool_metrics.record("checkouts"))
+            event.listen(_engine, "checkin", lambda *args: pool_metrics.record("checkins"))
+        return _engine
+
+
+@contextmanager
+def connect(**execution_options):
+    """
+    Checks a connection out of the shared pool, recording how long the checkout waited.
+
+    Args:
+        **execution_options: Passed to Connection.execution_options (e.g. stream_results=True).
+
+    Yields:
+        sqlalchemy.engine.Connection: Pooled connection, returned to the pool on exit.
+    """
+    start = time.perf_counter()
+    with get_engine().connect() as conn:
+        pool_metrics.record_wait(time.perf_counter() - start)
+        if execution_options:
+            conn = conn.execution_options(**execution_options)
+        yield conn
+
+
+@contextmanager
+def begin():
+    """
+    Like connect(), but runs the block in a transaction that commits on success.
+
+    Yields:
+        sqlalchemy.engine.Connection: Pooled connection inside a transaction.
+    """
+    start = time.perf_counter()
+    with get_engine().begin() as conn:
+        pool_metrics.record_wait(time.perf_counter() - start)
+        yield conn
+
+
+@contextmanager
+def raw_connection():
+    """
+    Checks a raw psycopg2 connection out of the same pool for bulk paths
+    (COPY, execute_values) that need the DBAPI cursor directly.
+    Commits on success and rolls back on error.
+
+    Yields:
+        psycopg2 connection (pool proxy), returned to the pool on exit.
+    """
+    start = time.perf_counter()
+    conn = get_engine().raw_connection()
+    pool_metrics.record_wait(time.perf_counter() - start)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@contextmanager
+def admin_connection():
+    """
+    Opens an unpooled autocommit connection to the default 'postgres' database,
+    for statements like CREATE DATABASE that cannot run inside a transaction.
+
+    Yields:
+        psycopg2 connection.
+    """
+    conn = psycopg2.connect(**get_connection_params("postgres"))
+    conn.autocommit = True
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_pool_metrics():
+    """
+    Returns pool usage counters together with the pool's current status.
+
+    Returns:
+        dict: Checkout/checkin counts, wait times and pool configuration.
+    """
+    metrics = pool_metrics.snapshot()
+    metrics.update({"pool_size": POOL_SIZE, "max_overflow": MAX_OVERFLOW})
+    if _engine is not None:
+        metrics["pool_status"] = _engine.pool.status()
+    return metrics
+
+
+def dispose_engine():
+    """
+    Closes every pooled connection and drops the shared engine.
+
+    Returns:
+        None
+    """
+    global _engine, _engine_pid
+
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _engine_pid = None
@@ -1,4 +1,5 @@
-from sqlalchemy import Table, Column, String, Integer, MetaData, ForeignKey
+from sqlalchemy import Table, Column, String, Integer, Float, DateTime, MetaData, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 
 metadata = MetaData()
 
@@ -8,31 +9,42 @@ movies_table = Table(
     Column('_id', String, primary_key=True),
     Column('title', String, nullable=False),
     Column('plot', String, nullable=True),
-    Column('genres', String, nullable=True),
-    Column('cast', String, nullable=True),
-    Column('languages', String, nullable=True),
-    Column('directors', String, nullable=True),
-    Column('countries', String, nullable=True),
+    Column('genres', ARRAY(String), nullable=True),
+    Column('cast', ARRAY(String), nullable=True),
+    Column('languages', ARRAY(String), nullable=True),
+    Column('directors', ARRAY(String), nullable=True),
+    Column('countries', ARRAY(String), nullable=True),
     Column('fullplot', String, nullable=True),
     Column('runtime', Integer, nullable=True),
     Column('rated', String, nullable=True),
     Column('awards', String, nullable=True),
-    Column('released', String, nullable=True),
-    Column('imdb_rating', Integer, nullable=True),
+    Column('released', DateTime, nullable=True),
+    Column('imdb_rating', Float, nullable=True),
     Column('imdb_votes', Integer, nullable=True)
 )
 
+# B-tree index for exact title lookups, trigram GIN index for fuzzy/ILIKE title search
+# (requires the pg_trgm extension), and GIN indexes for array containment filters
+Index('ix_movies_title', movies_table.c.title)
+Index('ix_movies_title_trgm', movies_table.c.title,
+      postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+Index('ix_movies_genres', movies_table.c.genres, postgresql_using='gin')
+Index('ix_movies_cast', movies_table.c.cast, postgresql_using='gin')
+Index('ix_movies_directors', movies_table.c.directors, postgresql_using='gin')
+
 # Define the 'comments' table schema    
 comments_table = Table(
     'comments', metadata,
     Column('_id', String, primary_key=True),
-    Column('movie_id', String,nullable=False),
+    Column('movie_id', String, ForeignKey('movies._id', ondelete='CASCADE'), nullable=False),
     Column('name', String, nullable=True),
     Column('email', String, nullable=True),
     Column('text', String, nullable=True),
-    Column('date', String, nullable=True)
+    Column('date', DateTime, nullable=True)
 )
 
+Index('ix_comments_movie_id', comments_table.c.movie_id)
+
 # Define the 'users' table schema
 users_table = Table(
     'users', metadata,
@@ -50,6 +62,8 @@ sessions_table = Table(
 
 )
 
+Index('ix_sessions_user_id', sessions_table.c.user_id)
+
 # Define the 'theaters' table schema
 theaters_table = Table(
     'theaters', metadata,
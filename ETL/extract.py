@@ -1,5 +1,6 @@
 from pymongo import MongoClient
 from dotenv import load_dotenv
+from ETL.profiling import profile_stage
 import os
 
 
@@ -14,24 +15,17 @@ def extract_from_mongodb():
         client = MongoClient(os.getenv("MONGODB_URI"))
         db = client["sample_mflix"]
 
-        movies = list(db.movies.find())
-        embedded_movies = list(db.embedded_movies.find())
-        comments = list(db.comments.find())
-        sessions = list(db.sessions.find())
-        users = list(db.users.find())
-        theaters = list(db.theaters.find())
+        data = {}
+        for collection in ("movies", "embedded_movies", "comments", "sessions", "users", "theaters"):
+            with profile_stage(f"extract.{collection}") as stage:
+                data[collection] = list(db[collection].find())
+                stage["rows_out"] = len(data[collection])
 
-        print(f"Extracted {len(movies)} movies, {len(embedded_movies)} embedded movies, "
-            f"{len(comments)} comments, {len(sessions)} sessions, {len(users)} users, {len(theaters)} theaters.")
+        print(f"Extracted {len(data['movies'])} movies, {len(data['embedded_movies'])} embedded movies, "
+            f"{len(data['comments'])} comments, {len(data['sessions'])} sessions, "
+            f"{len(data['users'])} users, {len(data['theaters'])} theaters.")
         
-        return{
-            "movies" :movies,
-            "embedded_movies" :embedded_movies, 
-            "comments" :comments,
-            "sessions" :sessions,   
-            "users" : users,
-            "theaters" : theaters
-        }
+        return data
     except Exception as e:
         print(f"An error occured while extracting data from mongodb: {str(e)}")
 
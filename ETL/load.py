@@ -1,18 +1,11 @@
-from sqlalchemy import create_engine, inspect, text
-import os
+from sqlalchemy import text
+from psycopg2.extras import execute_values
 from ETL.db_schema import metadata
-from dotenv import load_dotenv
+from ETL.db_connection import get_engine, begin, raw_connection, get_pool_metrics
+from ETL.profiling import profile_stage
 
-load_dotenv()
-
-user = os.getenv("POSTGRES_USER")
-password = os.getenv("POSTGRES_PASSWORD")
-host = os.getenv("POSTGRES_HOST")   
-port = os.getenv("POSTGRES_PORT")
-db_name = os.getenv("POSTGRES_DB")
-db_uri = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
-engine = create_engine(db_uri)
-inspector = inspect(engine)
+# Rows per multi-row INSERT statement
+LOAD_PAGE_SIZE = 1000
 
 def create_tables_and_Load_data(transformed_data:dict):
     """
@@ -24,28 +17,34 @@ def create_tables_and_Load_data(transformed_data:dict):
     Returns:
         None
     """
+    engine = get_engine()
+
     print("Dropping existing tables if they exist...")
     metadata.drop_all(engine)
     print("Existing tables dropped successfully.")
 
     print("Creating Tables....")
+    with begin() as conn:
+        # gin_trgm_ops on movies.title needs pg_trgm
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
     metadata.create_all(engine)
     print("Tables created successfully.")
 
-    def clear_table_if_exists(table_name):
+    def clear_table_if_exists(cursor, table_name):
         """
         Clears the specified table if it exists in the PostgreSQL database.
         
         Args:
+            cursor: DBAPI cursor to run the TRUNCATE on.
             table_name (str): Name of the table to be cleared.
             
         Returns:
             None
         """
-        if table_name in inspector.get_table_names():
-            with engine.begin() as conn:
-                print(f"Clearing table {table_name}...")
-                conn.execute(text(f"TRUNCATE TABLE {table_name} CASCADE"))
+        cursor.execute("SELECT to_regclass(%s)", (table_name,))
+        if cursor.fetchone()[0] is not None:
+            print(f"Clearing table {table_name}...")
+            cursor.execute(f'TRUNCATE TABLE "{table_name}" CASCADE')
         else:
             print(f"Table {table_name} does not exist. Skipping clear operation.")
     
@@ -62,9 +61,18 @@ def create_tables_and_Load_data(transformed_data:dict):
             None
         """
         try:
-            clear_table_if_exists(table_name)
-            print(f"Loading data into {table_name}...")
-            dataframe.to_sql(table_name, con=engine, if_exists='append', index=False)
+            # Multi-row INSERTs via execute_values on a pooled DBAPI connection instead
+            # of pandas' per-row to_sql; psycopg2 adapts lists to ARRAY columns
+            columns = ", ".join(f'"{column}"' for column in dataframe.columns)
+            rows = dataframe.astype(object).where(dataframe.notna(), None).itertuples(index=False, name=None)
+            with profile_stage(f"load.{table_name}", rows_in=len(dataframe)) as stage, raw_connection() as conn:
+                cursor = conn.cursor()
+                clear_table_if_exists(cursor, table_name)
+                print(f"Loading data into {table_name}...")
+                execute_values(cursor, f'INSERT INTO "{table_name}" ({columns}) VALUES %s', rows,
+                               page_size=LOAD_PAGE_SIZE)
+                cursor.close()
+                stage["rows_out"] = len(dataframe)
             print(f"loaded {len(dataframe)} rows into {table_name} successfully.")
         except Exception as e:
             print(f"An error occurred while loading data into {table_name}: {str(e)}")
@@ -76,4 +84,5 @@ def create_tables_and_Load_data(transformed_data:dict):
     load_data_to_postgres("theaters", transformed_data["theaters"])
     load_data_to_postgres("sessions", transformed_data["sessions"])
     print("Data loaded successfully into PostgreSQL database.")
+    print(f"Connection pool usage: {get_pool_metrics()}")
 
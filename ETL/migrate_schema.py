@@ -0,0 +1,103 @@
+from sqlalchemy import inspect, text
+from ETL.db_schema import metadata, comments_table
+from ETL.db_connection import begin
+
+# Column type changes from the original all-text schema.
+# (table, column, target type, USING expression)
+COLUMN_MIGRATIONS = [
+    ("movies", "released", "timestamp", "NULLIF(NULLIF(released, ''), 'NaT')::timestamp"),
+    ("movies", "imdb_rating", "double precision", "imdb_rating::double precision"),
+    ("movies", "genres", "varchar[]", "string_to_array(NULLIF(genres, ''), ',')"),
+    ("movies", "cast", "varchar[]", "string_to_array(NULLIF(\"cast\", ''), ',')"),
+    ("movies", "languages", "varchar[]", "string_to_array(NULLIF(languages, ''), ',')"),
+    ("movies", "directors", "varchar[]", "string_to_array(NULLIF(directors, ''), ',')"),
+    ("movies", "countries", "varchar[]", "string_to_array(NULLIF(countries, ''), ',')"),
+    ("comments", "date", "timestamp", "NULLIF(NULLIF(date, ''), 'NaT')::timestamp"),
+]
+
+# information_schema.columns.data_type values that are already migrated
+TARGET_DATA_TYPES = {
+    "timestamp": "timestamp without time zone",
+    "double precision": "double precision",
+    "varchar[]": "ARRAY",
+}
+
+
+def get_column_type(conn, table_name, column_name):
+    """
+    Returns the information_schema data type of a column.
+
+    Args:
+        conn: Open SQLAlchemy connection.
+        table_name (str): Table name.
+        column_name (str): Column name.
+
+    Returns:
+        str: Data type, or None if the column does not exist.
+    """
+    return conn.execute(
+        text("SELECT data_type FROM information_schema.columns "
+             "WHERE table_name = :table AND column_name = :column"),
+        {"table": table_name, "column": column_name}
+    ).scalar()
+
+
+def migrate_schema():
+    """
+    Migrates tables created by the original schema (text dates, integer
+    imdb_rating, comma-joined lists, no indexes) to the current db_schema in place.
+    Every step checks the current state first, so the migration can be re-run safely.
+
+    Note: ratings already truncated by the old Integer column cannot be recovered
+    here; re-run the ETL pipeline to reload them with full precision.
+
+    Returns:
+        None
+    """
+    with begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+        for table_name, column_name, target_type, using in COLUMN_MIGRATIONS:
+            current_type = get_column_type(conn, table_name, column_name)
+            if current_type is None:
+                print(f"Column {table_name}.{column_name} does not exist. Skipping.")
+                continue
+            if current_type == TARGET_DATA_TYPES[target_type]:
+                print(f"Column {table_name}.{column_name} is already {target_type}.")
+                continue
+            print(f"Converting {table_name}.{column_name} from {current_type} to {target_type}...")
+            conn.execute(text(
+                f'ALTER TABLE {table_name} ALTER COLUMN "{column_name}" TYPE {target_type} USING {using}'
+            ))
+
+        inspector = inspect(conn)
+        foreign_keys = inspector.get_foreign_keys("comments")
+        if not any(fk["referred_table"] == "movies" for fk in foreign_keys):
+            print("Removing comments that reference unknown movies...")
+            result = conn.execute(text(
+                "DELETE FROM comments c WHERE NOT EXISTS "
+                "(SELECT 1 FROM movies m WHERE m._id = c.movie_id)"
+            ))
+            print(f"Removed {result.rowcount} orphaned comments.")
+
+            print("Adding foreign key comments.movie_id -> movies._id...")
+            conn.execute(text(
+                "ALTER TABLE comments ADD CONSTRAINT comments_movie_id_fkey "
+                "FOREIGN KEY (movie_id) REFERENCES movies (_id) ON DELETE CASCADE"
+            ))
+        else:
+            print(f"Foreign key on {comments_table.name}.movie_id already exists.")
+
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                print(f"Creating index {index.name} if missing...")
+                index.create(conn, checkfirst=True)
+
+        for table in metadata.sorted_tables:
+            conn.execute(text(f"ANALYZE {table.name}"))
+
+    print("Schema migration completed successfully.")
+
+
+if __name__ == "__main__":
+    migrate_schema()
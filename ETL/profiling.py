@@ -0,0 +1,252 @@
+from contextlib import contextmanager
+from functools import wraps
+import subprocess
+import platform
+import cProfile
+import pstats
+import shutil
+import signal
+import json
+import time
+import io
+import os
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Where JSON run reports (and optional profiler output) are written
+PIPELINE_REPORT_DIR = os.getenv("PIPELINE_REPORT_DIR", "pipeline_reports")
+
+# Opt-in hot-function profiling: "" (off), "cprofile" (per stage) or "py-spy" (whole run)
+PIPELINE_PROFILER = os.getenv("PIPELINE_PROFILER", "").lower()
+
+# Hot functions listed per stage when cProfile is on
+CPROFILE_TOP_N = 15
+
+_active_run = None
+
+
+def _peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None if unavailable).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def _current_rss_mb():
+    """
+    Current resident set size in MB, read from /proc on Linux (None elsewhere).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PipelineRun:
+    """
+    Collects per-stage resource usage for one pipeline run and writes it as JSON.
+    """
+
+    def __init__(self, name, report_dir=PIPELINE_REPORT_DIR, profiler=PIPELINE_PROFILER):
+        self.name = name
+        self.report_dir = report_dir
+        self.profiler = profiler
+        self.run_id = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.started_at = time.time()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self.stages = {}
+        self._py_spy = None
+        self._profiling = False
+        self._profiles = {}
+        os.makedirs(report_dir, exist_ok=True)
+
+    def start_py_spy(self):
+        """
+        Attaches `py-spy record` to this process for the whole run, if it is installed.
+        """
+        if shutil.which("py-spy") is None:
+            print("PIPELINE_PROFILER=py-spy but py-spy is not installed; skipping.")
+            return
+        output = os.path.join(self.report_dir, f"{self.run_id}.speedscope.json")
+        self._py_spy = subprocess.Popen(
+            ["py-spy", "record", "--pid", str(os.getpid()), "--format", "speedscope", "-o", output],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def stop_py_spy(self):
+        if self._py_spy is not None:
+            # SIGINT makes py-spy flush its output file before exiting
+            self._py_spy.send_signal(signal.SIGINT)
+            self._py_spy.wait(timeout=30)
+            self._py_spy = None
+
+    def record(self, name, wall, cpu, rows_in, rows_out, rss_end, peak_delta):
+        stage = self.stages.setdefault(name, {
+            "stage": name, "calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+            "rows_in": None, "rows_out": None, "peak_rss_delta_mb": None, "rss_end_mb": None,
+        })
+        stage["calls"] += 1
+        stage["wall_s"] += wall
+        stage["cpu_s"] += cpu
+        if rows_in is not None:
+            stage["rows_in"] = (stage["rows_in"] or 0) + rows_in
+        if rows_out is not None:
+            stage["rows_out"] = (stage["rows_out"] or 0) + rows_out
+        if peak_delta is not None:
+            stage["peak_rss_delta_mb"] = max(stage["peak_rss_delta_mb"] or 0.0, peak_delta)
+        stage["rss_end_mb"] = rss_end
+
+    def _hot_functions(self, name):
+        """
+        Dumps a stage's cProfile stats next to the report and returns its top entries.
+        """
+        profile = self._profiles[name]
+        profile.dump_stats(os.path.join(self.report_dir, f"{self.run_id}.{name}.prof"))
+        buffer = io.StringIO()
+        pstats.Stats(profile, stream=buffer).sort_stats("cumulative").print_stats(CPROFILE_TOP_N)
+        return [line.strip() for line in buffer.getvalue().splitlines()
+                if line.strip()[:1].isdigit() and "function calls" not in line]
+
+    def report(self):
+        stages = []
+        for stage in self.stages.values():
+            stage = dict(stage)
+            rows = stage["rows_out"] if stage["rows_out"] is not None else stage["rows_in"]
+            stage["rows_per_s"] = round(rows / stage["wall_s"], 1) if rows and stage["wall_s"] > 0 else None
+            for key in ("wall_s", "cpu_s", "peak_rss_delta_mb", "rss_end_mb"):
+                if stage[key] is not None:
+                    stage[key] = round(stage[key], 3)
+            if stage["stage"] in self._profiles:
+                stage["hot_functions"] = self._hot_functions(stage["stage"])
+            stages.append(stage)
+        return {
+            "run_id": self.run_id,
+            "pipeline": self.name,
+            "host": platform.node(),
+            "pid": os.getpid(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "wall_s": round(time.perf_counter() - self._start_wall, 3),
+            "cpu_s": round(time.process_time() - self._start_cpu, 3),
+            "peak_rss_mb": round(_peak_rss_mb(), 1) if _peak_rss_mb() is not None else None,
+            "profiler": self.profiler or None,
+            "stages": stages,
+        }
+
+    def write_report(self):
+        path = os.path.join(self.report_dir, f"{self.run_id}.json")
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+
+def start_run(name):
+    """
+    Starts collecting stage metrics for a pipeline run.
+
+    Args:
+        name (str): Pipeline name, e.g. "etl" or "embedding_build".
+
+    Returns:
+        PipelineRun: The active run.
+    """
+    global _active_run
+    _active_run = PipelineRun(name)
+    if _active_run.profiler == "py-spy":
+        _active_run.start_py_spy()
+    return _active_run
+
+
+def finish_run():
+    """
+    Writes the active run's JSON report and stops collecting.
+
+    Returns:
+        str: Path of the report, or None if no run was active.
+    """
+    global _active_run
+    if _active_run is None:
+        return None
+    _active_run.stop_py_spy()
+    path = _active_run.write_report()
+    print(f"Pipeline run report written to {path}")
+    _active_run = None
+    return path
+
+
+@contextmanager
+def profile_stage(name, rows_in=None):
+    """
+    Measures wall time, CPU time, RSS and row counts of a block as one stage.
+
+    Set stage["rows_out"] (and optionally stage["rows_in"]) inside the block, or
+    stage["discard"] = True to leave this call out of the report (e.g. a read
+    that found nothing left). Does nothing but yield a scratch dict when no run is active.
+
+    Args:
+        name (str): Stage name in the report.
+        rows_in (int): Rows entering the stage.
+
+    Yields:
+        dict: Mutable stage record.
+    """
+    stage = {"rows_in": rows_in, "rows_out": None}
+    run = _active_run
+    if run is None:
+        yield stage
+        return
+
+    # cProfile can't nest, so the outermost profiled stage owns it; repeated
+    # calls of the same stage accumulate into one profile
+    profile = None
+    if run.profiler == "cprofile" and not run._profiling:
+        profile = run._profiles.setdefault(name, cProfile.Profile())
+    peak_before = _peak_rss_mb()
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    if profile is not None:
+        run._profiling = True
+        profile.enable()
+    try:
+        yield stage
+    finally:
+        if profile is not None:
+            profile.disable()
+            run._profiling = False
+        wall = time.perf_counter() - start_wall
+        cpu = time.process_time() - start_cpu
+        peak_after = _peak_rss_mb()
+
+        if not stage.get("discard"):
+            run.record(
+                name, wall, cpu, stage["rows_in"], stage["rows_out"], _current_rss_mb(),
+                peak_after - peak_before if peak_before is not None else None
+            )
+
+
+def profiled(name=None):
+    """
+    Decorator form of profile_stage for functions that take a collection and
+    return one (rows in = len of the first argument, rows out = len of the result).
+
+    Args:
+        name (str): Stage name. Defaults to the function name.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_in = len(args[0]) if args and hasattr(args[0], "__len__") else None
+            with profile_stage(name or func.__name__, rows_in=rows_in) as stage:
+                result = func(*args, **kwargs)
+                stage["rows_out"] = len(result) if hasattr(result, "__len__") else None
+            return result
+        return wrapper
+    return decorator
@@ -1,6 +1,8 @@
 import pandas as pd
 from bson import ObjectId
+from ETL.profiling import profiled
 
+@profiled("transform.comments")
 def flatten_comments(comments_raw):
     """
     Flattens the comments data by extracting relevant fields and converting it to a DataFrame.
@@ -17,10 +19,11 @@ def flatten_comments(comments_raw):
     df['name'] = df.get('name', '')
     df['email'] = df.get('email', '')
     df['text'] = df.get('text', '')
-    df["date"] = df["date"].astype(str)
+    df["date"] = pd.to_datetime(df["date"], errors='coerce')
 
     return df 
 
+@profiled("transform.users")
 def flatten_users(users_raw):
     """
     Flattens the users data by extracting relevant fields and converting it to a DataFrame.
@@ -36,6 +39,7 @@ def flatten_users(users_raw):
 
     return df[["_id", "name", "email"]]
 
+@profiled("transform.movies")
 def flatten_movies(movies_raw):
     """
     Flattens the movies data by extracting relevant fields and converting it to a DataFrame.
@@ -59,22 +63,24 @@ def flatten_movies(movies_raw):
     df['imdb_rating'] = df.get('imdb.rating', None)
     df['imdb_votes'] = df.get('imdb.votes', None)
 
-    df['genres'] = df.get('genres', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")
-    df['cast'] = df.get('cast', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")
-    df['languages'] = df.get('languages', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")
-    df['directors'] = df.get('directors', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")
-    df['countries'] = df.get('countries', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")    
+    df['genres'] = df.get('genres', []).apply(lambda x: list(x) if isinstance(x,list) else [])
+    df['cast'] = df.get('cast', []).apply(lambda x: list(x) if isinstance(x,list) else [])
+    df['languages'] = df.get('languages', []).apply(lambda x: list(x) if isinstance(x,list) else [])
+    df['directors'] = df.get('directors', []).apply(lambda x: list(x) if isinstance(x,list) else [])
+    df['countries'] = df.get('countries', []).apply(lambda x: list(x) if isinstance(x,list) else [])    
 
     # Convert to numeric types safely
     df['runtime'] = pd.to_numeric(df['runtime'], errors='coerce')
     df['imdb_votes'] = pd.to_numeric(df['imdb_votes'], errors='coerce')
     df['imdb_rating'] = pd.to_numeric(df['imdb_rating'], errors='coerce')
+    df['released'] = pd.to_datetime(df['released'], errors='coerce')
 
     return df[["_id", "title", "plot", "genres", "cast", "languages",
                 "directors", "countries", "fullplot", "runtime", "rated",
                 "awards", "released", "imdb_rating", "imdb_votes"]]
 
 
+@profiled("transform.embeddedmovies")
 def flatten_embeddedmovies(movies_raw):
     """
     Flattens the movies data by extracting relevant fields and converting it to a DataFrame.
@@ -100,22 +106,24 @@ def flatten_embeddedmovies(movies_raw):
     df['writers'] = df['writers'].apply(lambda x: ','.join(x) if isinstance(x, list) else "")
     df['production'] = df.get('production', '')
 
-    df['genres'] = df.get('genres', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")
-    df['cast'] = df.get('cast', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")
-    df['languages'] = df.get('languages', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")
-    df['directors'] = df.get('directors', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")
-    df['countries'] = df.get('countries', []).apply(lambda x: ','.join(x) if isinstance(x,list) else "")    
+    df['genres'] = df.get('genres', []).apply(lambda x: list(x) if isinstance(x,list) else [])
+    df['cast'] = df.get('cast', []).apply(lambda x: list(x) if isinstance(x,list) else [])
+    df['languages'] = df.get('languages', []).apply(lambda x: list(x) if isinstance(x,list) else [])
+    df['directors'] = df.get('directors', []).apply(lambda x: list(x) if isinstance(x,list) else [])
+    df['countries'] = df.get('countries', []).apply(lambda x: list(x) if isinstance(x,list) else [])    
 
     # Convert to numeric types safely
     df['runtime'] = pd.to_numeric(df['runtime'], errors='coerce')
     df['imdb_votes'] = pd.to_numeric(df['imdb_votes'], errors='coerce')
     df['imdb_rating'] = pd.to_numeric(df['imdb_rating'], errors='coerce')
+    df['released'] = pd.to_datetime(df['released'], errors='coerce')
 
 
     return df[["_id", "title", "plot", "genres", "cast", "languages",
                 "directors", "countries", "fullplot", "runtime", "rated",
                 "awards", "released", "imdb_rating", "imdb_votes"]]
 
+@profiled("transform.theaters")
 def flatten_theaters(theaters_raw):
     """
     Flattens the theaters data by extracting relevant fields and converting it to a DataFrame.
@@ -134,6 +142,7 @@ def flatten_theaters(theaters_raw):
 
     return df[["_id", "theater_id", "theater_city", "theater_state"]]
 
+@profiled("transform.sessions")
 def flatten_sessions(raw):
     df = pd.json_normalize(raw)
     df["_id"] = df["_id"].astype(str)
@@ -156,9 +165,16 @@ def transform_data(raw_data: dict):
     all_movies_df = pd.concat([movies_df, embedded_movies_df], ignore_index=True)
     all_movies_df.drop_duplicates(subset="_id", inplace=True)
 
+    # comments.movie_id is a foreign key to movies._id, so orphaned comments are dropped
+    comments_df = flatten_comments(raw_data["comments"])
+    orphaned = ~comments_df["movie_id"].isin(all_movies_df["_id"])
+    if orphaned.any():
+        print(f"Dropping {int(orphaned.sum())} comments that reference unknown movies.")
+        comments_df = comments_df[~orphaned]
+
     return {
         "movies": all_movies_df,
-        "comments": flatten_comments(raw_data["comments"]),
+        "comments": comments_df,
         "users": flatten_users(raw_data["users"]),
         "theaters": flatten_theaters(raw_data["theaters"]),
         "sessions": flatten_sessions(raw_data["sessions"])
@@ -1,114 +1,301 @@
 # Embeddings/build_vectorstore.py
 
-from sqlalchemy import create_engine
+from sqlalchemy import text
 from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Pinecone
-from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone
+from ETL.db_connection import connect
+from ETL.profiling import start_run, finish_run, profile_stage
+from Embeddings.dedup import MinHashDeduplicator, DEDUP_ENABLED
+from rag_pipeline.model_loader import create_embeddings
+from rag_pipeline.index_manifest import write_index_manifest
+from string import Formatter
 import pandas as pd
+import json
+import time
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+# Rows fetched per server-side cursor round trip
+SQL_CHUNKSIZE = int(os.getenv("EMBEDDING_SQL_CHUNKSIZE", "5000"))
 
-# DB Connection
-user = os.getenv("POSTGRES_USER")
-password = os.getenv("POSTGRES_PASSWORD")
-host = os.getenv("POSTGRES_HOST")   
-port = os.getenv("POSTGRES_PORT")
-db_name = os.getenv("POSTGRES_DB")
-db_uri = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
-engine = create_engine(db_uri)
+# Where the near-duplicate map (kept chunk id -> collapsed chunk ids) is written
+DEDUP_MAP_PATH = os.getenv("DEDUP_MAP_PATH", "dedup_map.json")
+
+# Vectors per Pinecone upsert request
+UPLOAD_BATCH_SIZE = 100
+
+
+# text[] columns in the movies table, rendered back to comma-joined text for the sentences
+ARRAY_COLUMNS = {"genres", "cast", "languages", "directors", "countries"}
+
+# Source table -> (columns needed by the template, sentence template)
+SENTENCE_SOURCES = {
+    "movies": (
+        ["_id", "title", "genres", "released", "directors", "cast", "plot", "fullplot",
+         "languages", "countries", "runtime", "rated", "imdb_rating", "imdb_votes", "awards"],
+        "'{title}' is a {genres} movie released on {released}. "
+        "It was directed by {directors} and stars {cast}. "
+        "The main plot: {plot} Full story: {fullplot}. "
+        "The film is available in {languages} and was produced in {countries}. "
+        "It runs for {runtime} minutes and is rated '{rated}'. "
+        "IMDb rating: {imdb_rating} based on {imdb_votes} votes. "
+        "Awards received: {awards}."
+    ),
+    "comments": (
+        ["_id", "date", "name", "movie_id", "text", "email"],
+        "On {date}, {name} commented on movie ID {movie_id}: "
+        "\"{text}\". Contact email: {email}."
+    ),
+    "users": (
+        ["_id", "name", "email"],
+        "This is the user profile of {name} with the email address {email}."
+    ),
+    "theaters": (
+        ["_id", "theater_city", "theater_state"],
+        "Theater located in {theater_city}, {theater_state}."
+    ),
+    "sessions": (
+        ["_id", "user_id"],
+        "Session ID {_id} was created by user ID {user_id}."
+    ),
+}
+
+
+def compile_template(template):
+    """
+    Pre-compiles a named sentence template into a positional format function so
+    whole columns can be rendered in one pass instead of row by row with df.apply.
+
+    Args:
+        template (str): str.format style template, e.g. "Theater located in {theater_city}."
+
+    Returns:
+        tuple: (bound str.format of the positional template, list of column names in order).
+    """
+    fields = []
+    parts = []
+    for literal, field, _, _ in Formatter().parse(template):
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            parts.append(f"{{{len(fields)}}}")
+            fields.append(field)
+    return "".join(parts).format, fields
+
+
+def render_sentences(df, compiled_template):
+    """
+    Renders one sentence per DataFrame row from a compiled template.
+
+    Args:
+        df (pd.DataFrame): Chunk of rows read from PostgreSQL.
+        compiled_template (tuple): Output of compile_template.
+
+    Returns:
+        pd.Series: Rendered sentences aligned with df's index.
+    """
+    fmt, fields = compiled_template
+    columns = [df[field].to_numpy(dtype=object) for field in fields]
+    return pd.Series(list(map(fmt, *columns)), index=df.index, dtype=object)
+
+
+def select_expression(column):
+    """
+    Builds the SELECT expression for a template column, quoting the name
+    ("cast" is a reserved word) and flattening text[] columns in SQL.
+
+    Args:
+        column (str): Column name.
+
+    Returns:
+        str: SQL select expression aliased to the column name.
+    """
+    if column in ARRAY_COLUMNS:
+        return f"array_to_string(\"{column}\", ',') AS \"{column}\""
+    return f'"{column}"'
+
+
+def iter_document_batches(chunksize=SQL_CHUNKSIZE, sources=None, bucket=None, num_buckets=None):
+    """
+    Streams Documents from PostgreSQL one chunk at a time.
+
+    Each table is read through a server-side cursor selecting only the columns its
+    template needs, so at most `chunksize` rows are held in memory at once.
+
+    Args:
+        chunksize (int): Number of rows fetched per chunk.
+        sources (list): Tables to read. Defaults to all of SENTENCE_SOURCES.
+        bucket (int): Only read rows whose _id hashes to this bucket (for sharded builds).
+        num_buckets (int): Number of hash buckets `bucket` is taken from.
+
+    Yields:
+        list: Documents built from one chunk of one table.
+    """
+    for source in sources or SENTENCE_SOURCES:
+        columns, template = SENTENCE_SOURCES[source]
+        compiled = compile_template(template)
+        column_list = ", ".join(select_expression(c) for c in columns)
+        query = f"SELECT {column_list} FROM {source}"
+        params = {}
+        if num_buckets:
+            query += ' WHERE (hashtext("_id")::bigint & 2147483647) % :num_buckets = :bucket'
+            params = {"num_buckets": num_buckets, "bucket": bucket}
+
+        with connect(stream_results=True) as conn:
+            for df in pd.read_sql(text(query), conn, params=params, chunksize=chunksize):
+                sentences = render_sentences(df, compiled).str.strip()
+                keep = sentences.str.len() > 10
+                yield [
+                    Document(page_content=sentence, metadata={"source": source, "row_id": str(row_id)})
+                    for row_id, sentence in zip(df["_id"][keep], sentences[keep])
+                ]
+
+
+def make_splitter():
+    """
+    Returns the text splitter shared by the single-process and sharded builds.
+    """
+    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+
+def assign_chunk_ids(split_docs):
+    """
+    Gives each chunk a stable id "<source>:<row_id>:<n>" and records it in metadata,
+    so re-running the build overwrites vectors instead of duplicating them and the
+    app can fetch chunk text back by id.
+
+    Args:
+        split_docs (list): Chunks of one batch; all chunks of a row are in the same batch.
+
+    Returns:
+        list: The ids, in the same order as split_docs.
+    """
+    counters = {}
+    ids = []
+    for doc in split_docs:
+        key = (doc.metadata["source"], doc.metadata["row_id"])
+        n = counters.get(key, 0)
+        counters[key] = n + 1
+        doc.metadata["chunk_id"] = f"{key[0]}:{key[1]}:{n}"
+        ids.append(doc.metadata["chunk_id"])
+    return ids
 
 
 # SQL → Sentences
 def load_and_prepare_sentences():
-    df_movies = pd.read_sql("SELECT * FROM movies", engine)
-    df_comments = pd.read_sql("SELECT * FROM comments", engine)
-    df_users = pd.read_sql("SELECT * FROM users", engine)
-    df_theaters = pd.read_sql("SELECT * FROM theaters", engine)
-    df_sessions = pd.read_sql("SELECT * FROM sessions", engine)
-
-    def movie_to_sentences(row):
-        return (
-        f"'{row['title']}' is a {row['genres']} movie released on {row['released']}. "
-        f"It was directed by {row['directors']} and stars {row['cast']}. "
-        f"The main plot: {row['plot']} Full story: {row['fullplot']}. "
-        f"The film is available in {row['languages']} and was produced in {row['countries']}. "
-        f"It runs for {row['runtime']} minutes and is rated '{row['rated']}'. "
-        f"IMDb rating: {row['imdb_rating']} based on {row['imdb_votes']} votes. "
-        f"Awards received: {row['awards']}."
-    )
-
-    def comment_to_sentences(row):
-        return (
-        f"On {row['date']}, {row['name']} commented on movie ID {row['movie_id']}: "
-        f"\"{row['text']}\". Contact email: {row['email']}."
-    )
-
-    def user_to_sentences(row):
-        return (
-        f"This is the user profile of {row['name']} with the email address {row['email']}."
-    )
-
-    def theater_to_sentences(row):
-        return f"Theater located in {row['theater_city']}, {row['theater_state']}."
-
-    def session_to_sentences(row):
-        return f"Session ID {row['_id']} was created by user ID {row['user_id']}."
-
-    all_sentences = (
-        df_movies.apply(movie_to_sentences, axis=1).tolist() +
-        df_comments.apply(comment_to_sentences, axis=1).tolist() +
-        df_users.apply(user_to_sentences, axis=1).tolist() +
-        df_theaters.apply(theater_to_sentences, axis=1).tolist() +
-        df_sessions.apply(session_to_sentences, axis=1).tolist()
-    )
-
-    return [s.strip() for s in all_sentences if isinstance(s, str) and len(s.strip()) > 10]
+    return [doc.page_content for batch in iter_document_batches() for doc in batch]
 
 # Build vectorstore & save
-def build_and_save_vectorstore():
+def build_and_save_vectorstore(embedding_backend=None, dedup=DEDUP_ENABLED):
+    """
+    Embeds every SQL-derived document and uploads it to Pinecone.
+
+    Args:
+        embedding_backend (str): "torch" or "onnx". Defaults to EMBEDDING_BACKEND.
+        dedup (bool): Collapse near-duplicate chunks (MinHash/LSH) before embedding.
+    """
     # ✅ Pinecone connection
     pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
     index_name = "rag-movies-qa"
     pinecone_index_obj = pc.Index(index_name)
 
+    splitter = make_splitter()
+    embeddings = create_embeddings(embedding_backend)
 
-    sentences = load_and_prepare_sentences()
-    print(f"Loaded {len(sentences)} sentences from SQL database.")
 
-    docs = [Document(page_content=s) for s in sentences]
-    print(f"Converted to {len(docs)} Document objects.")
+    # # ✅ Pinecone vectorstore and upload
+    # vectorstore = Pinecone(index, embeddings, text_key="page_content")
+    # vectorstore.add_documents(split_docs)
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    split_docs = splitter.split_documents(docs)
-    print(f"Split into {len(split_docs)} chunks.")
+    # Vectors are embedded and upserted separately (rather than through
+    # PineconeVectorStore.add_documents) so both show up as their own stages.
+    # The chunk text goes under metadata["text"], which PineconeVectorStore reads back.
 
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    deduplicator = MinHashDeduplicator() if dedup else None
 
+    #  Split, embed and upload one SQL chunk at a time to keep memory bounded
+    start_run("embedding_build")
+    try:
+        total_docs = 0
+        total_chunks = 0
+        uploaded_chunks = 0
+        dedup_seconds = 0.0
+        embed_seconds = 0.0
+        upload_seconds = 0.0
+        dimension = None
+        batches = iter_document_batches()
+        while True:
+            with profile_stage("sentence_prep") as stage:
+                docs = next(batches, None)
+                stage["rows_out"] = len(docs) if docs else 0
+                # The read that finds the batches exhausted is not a batch
+                stage["discard"] = docs is None
+            if docs is None:
+                break
+            if not docs:
+                continue
 
-    # # ✅ Pinecone vectorstore and upload
-    # vectorstore = Pinecone(index, embeddings, text_key="page_content")
-    # vectorstore.add_documents(split_docs)
+            with profile_stage("splitting", rows_in=len(docs)) as stage:
+                split_docs = splitter.split_documents(docs)
+                assign_chunk_ids(split_docs)
+                stage["rows_out"] = len(split_docs)
+            total_docs += len(docs)
+            total_chunks += len(split_docs)
+
+            if deduplicator is not None:
+                start = time.perf_counter()
+                with profile_stage("dedup", rows_in=len(split_docs)) as stage:
+                    split_docs = deduplicator.filter(split_docs)
+                    stage["rows_out"] = len(split_docs)
+                dedup_seconds += time.perf_counter() - start
+            if not split_docs:
+                continue
+
+            start = time.perf_counter()
+            texts = [doc.page_content for doc in split_docs]
+            with profile_stage("embedding", rows_in=len(texts)) as stage:
+                vectors = embeddings.embed_documents(texts)
+                stage["rows_out"] = len(vectors)
+            embed_seconds += time.perf_counter() - start
+            dimension = len(vectors[0])
+
+            start = time.perf_counter()
+            with profile_stage("upload", rows_in=len(vectors)) as stage:
+                records = [
+                    (doc.metadata["chunk_id"], list(vector), dict(doc.metadata, text=doc.page_content))
+                    for doc, vector in zip(split_docs, vectors)
+                ]
+                for i in range(0, len(records), UPLOAD_BATCH_SIZE):
+                    pinecone_index_obj.upsert(vectors=records[i:i + UPLOAD_BATCH_SIZE])
+                stage["rows_out"] = len(records)
+            upload_seconds += time.perf_counter() - start
+            uploaded_chunks += len(split_docs)
+            print(f"Uploaded {uploaded_chunks} of {total_chunks} chunks from {total_docs} documents to Pinecone...")
+    finally:
+        finish_run()
 
-    # ⬇️ Instantiate PineconeVectorStore directly
-    vectorstore = PineconeVectorStore(
-        index=pinecone_index_obj,    # Pass your Pinecone Index object here
-        embedding=embeddings,
-        text_key="text"              # Pinecone typically uses "text" as the default key for content.
-                                     # Document.page_content will be mapped to this key.
-    )
+    if deduplicator is not None:
+        removed = deduplicator.removed
+        per_chunk = (embed_seconds + upload_seconds) / uploaded_chunks if uploaded_chunks else 0.0
+        with open(DEDUP_MAP_PATH, "w") as f:
+            json.dump(deduplicator.source_map(), f)
+        print(f"Near-duplicate removal: {removed} of {total_chunks} chunks collapsed "
+              f"(threshold {deduplicator.threshold}) in {dedup_seconds:.1f}s; "
+              f"~{removed * per_chunk:.1f}s of embedding/upload saved. Source map written to {DEDUP_MAP_PATH}.")
 
-    #  Add documents to the vectorstore
-    print(f"Uploading {len(split_docs)} chunks to Pinecone...")
-    vectorstore.add_documents(split_docs)
+    if uploaded_chunks:
+        print(f"Embedding took {embed_seconds:.1f}s and upload {upload_seconds:.1f}s "
+              f"for {uploaded_chunks} chunks.")
 
-    print("✅ Embeddings successfully uploaded to Pinecone!")
+    print(f"✅ Embeddings successfully uploaded to Pinecone! ({total_docs} documents, {uploaded_chunks} chunks)")
+    # New build id (in the manifest and the live index), so answers precomputed
+    # against the old index stop being served
+    write_index_manifest(index=pinecone_index_obj, dimension=dimension,
+                         index_name=index_name, documents=total_docs, chunks=uploaded_chunks)
 
 if __name__ == "__main__":
     build_and_save_vectorstore()
@@ -0,0 +1,131 @@
+# Embeddings/dedup.py
+
+import numpy as np
+import zlib
+import os
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+
+# Mersenne prime for the (a * x + b) mod p hash family; a * x stays below 2**62
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def choose_bands(num_perm, threshold):
+    """
+    Picks the LSH banding (bands x rows = num_perm) whose S-curve threshold
+    (1 / bands) ** (1 / rows) is closest to the requested Jaccard threshold.
+
+    Args:
+        num_perm (int): Signature length.
+        threshold (float): Target Jaccard similarity.
+
+    Returns:
+        tuple: (bands, rows)
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def shingles(text, size=DEDUP_SHINGLE_SIZE):
+    """
+    Character shingles of the whitespace/case-normalized text, hashed to 31 bits.
+
+    Args:
+        text (str): Chunk text.
+        size (int): Characters per shingle.
+
+    Returns:
+        np.ndarray: Unique shingle hashes (uint64).
+    """
+    normalized = " ".join(text.split()).lower()
+    if len(normalized) <= size:
+        grams = {normalized}
+    else:
+        grams = {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) & _MERSENNE_PRIME for g in grams),
+                       dtype=np.uint64, count=len(grams))
+
+
+class MinHashDeduplicator:
+    """
+    Streaming near-duplicate detector using MinHash signatures and LSH banding.
+
+    Chunks are added one at a time; a chunk whose estimated Jaccard similarity to
+    an earlier kept chunk reaches `threshold` is reported as a duplicate of it.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM,
+                 shingle_size=DEDUP_SHINGLE_SIZE, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = {}
+        # kept chunk id -> ids of the duplicates collapsed into it
+        self.duplicates = {}
+
+    def signature(self, text):
+        hashes = shingles(text, self.shingle_size)[None, :]
+        return ((self._a * hashes + self._b) % _MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+    def add(self, chunk_id, text):
+        """
+        Checks a chunk against everything kept so far and keeps it if it is new.
+
+        Args:
+            chunk_id (str): Id of the chunk.
+            text (str): Chunk text.
+
+        Returns:
+            str: Id of the kept chunk this one duplicates, or None if it was kept.
+        """
+        signature = self.signature(text)
+        band_keys = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        checked = set()
+        for band, key in enumerate(band_keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    self.duplicates[candidate].append(chunk_id)
+                    return candidate
+
+        self._signatures[chunk_id] = signature
+        self.duplicates[chunk_id] = []
+        for band, key in enumerate(band_keys):
+            self._buckets[band].setdefault(key, []).append(chunk_id)
+        return None
+
+    def filter(self, docs, id_key="chunk_id"):
+        """
+        Drops near-duplicate Documents, keeping the first occurrence.
+
+        Args:
+            docs (list): Documents with a chunk id in metadata[id_key].
+            id_key (str): Metadata key holding the chunk id.
+
+        Returns:
+            list: Documents that were kept.
+        """
+        return [doc for doc in docs if self.add(doc.metadata[id_key], doc.page_content) is None]
+
+    def source_map(self):
+        """
+        Returns kept chunk id -> duplicate chunk ids, only for chunks that absorbed duplicates.
+        """
+        return {kept: dups for kept, dups in self.duplicates.items() if dups}
+
+    @property
+    def removed(self):
+        return sum(len(dups) for dups in self.duplicates.values())
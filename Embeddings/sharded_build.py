@@ -0,0 +1,369 @@
+# Embeddings/sharded_build.py
+#
+# Sharded, resumable version of build_and_save_vectorstore.
+#
+# The corpus is split into one shard per (source table, _id hash bucket). Each
+# shard is embedded independently -- in a local process pool or on separate
+# machines sharing SHARD_DIR -- and writes its vectors plus a .done marker.
+# Re-running skips shards that already have a marker. `merge` then assembles
+# the shards into a local vector store or uploads them to Pinecone.
+#
+#     python -m Embeddings.sharded_build build --num-shards 8 --workers 4
+#     python -m Embeddings.sharded_build build --num-shards 8 --worker-id 1 --num-workers 3   # one node of three
+#     python -m Embeddings.sharded_build merge --target local
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Embeddings.Embeddings import (
+    SENTENCE_SOURCES, UPLOAD_BATCH_SIZE, iter_document_batches, make_splitter, assign_chunk_ids
+)
+from Embeddings.dedup import MinHashDeduplicator, DEDUP_ENABLED
+from rag_pipeline.model_loader import (
+    create_embeddings, EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_QUANTIZED
+)
+from rag_pipeline.index_manifest import write_index_manifest
+import numpy as np
+import argparse
+import json
+import time
+import os
+
+SHARD_DIR = os.getenv("SHARD_DIR", "shards")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+
+# Embedding model loaded once per worker process
+_worker_embeddings = None
+
+
+def list_shards(num_shards):
+    """
+    Enumerates every shard as (name, source table, bucket).
+
+    Args:
+        num_shards (int): Hash buckets per source table.
+
+    Returns:
+        list: Shard descriptors in a stable order.
+    """
+    return [
+        (f"{source}-{bucket:03d}-of-{num_shards:03d}", source, bucket)
+        for source in SENTENCE_SOURCES
+        for bucket in range(num_shards)
+    ]
+
+
+def _shard_paths(shard_dir, name):
+    base = os.path.join(shard_dir, name)
+    return {"vectors": base + ".npy", "docs": base + ".jsonl", "done": base + ".done", "uploaded": base + ".uploaded"}
+
+
+def _embedding_config(embedding_backend):
+    """
+    Identifies the vectors a backend produces: the model and, for ONNX, whether it is quantized.
+    """
+    backend = embedding_backend or EMBEDDING_BACKEND
+    return {
+        "backend": backend,
+        "model": EMBEDDING_MODEL_NAME,
+        "quantized": backend == "onnx" and EMBEDDING_ONNX_QUANTIZED,
+    }
+
+
+def _write_manifest(shard_dir, num_shards, embedding_backend=None):
+    """
+    Records the shard layout and embedding model, refusing to mix runs with
+    different shard counts or vectors from a different model.
+    """
+    path = os.path.join(shard_dir, "manifest.json")
+    embedding = _embedding_config(embedding_backend)
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest["num_shards"] != num_shards:
+            raise ValueError(
+                f"{shard_dir} holds a {manifest['num_shards']}-shard build; "
+                f"use --num-shards {manifest['num_shards']} or a new SHARD_DIR."
+            )
+        if manifest.get("embedding") != embedding:
+            raise ValueError(
+                f"{shard_dir} holds vectors from {manifest.get('embedding')}, not {embedding}; "
+                f"use the same --embedding-backend or a new SHARD_DIR."
+            )
+        return manifest
+    manifest = {"num_shards": num_shards, "sources": list(SENTENCE_SOURCES), "embedding": embedding,
+                "created_at": time.time()}
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def _init_worker(embedding_backend):
+    global _worker_embeddings
+    _worker_embeddings = create_embeddings(embedding_backend)
+
+
+def build_shard(name, source, bucket, num_shards, shard_dir=SHARD_DIR, embedding_backend=None, dedup=DEDUP_ENABLED):
+    """
+    Embeds one shard and writes its vectors, documents and completion marker.
+
+    Output files are written under temporary names and renamed into place, and the
+    .done marker is written last, so a crash never leaves a shard that looks complete.
+
+    Args:
+        name (str): Shard name from list_shards.
+        source (str): Source table.
+        bucket (int): _id hash bucket.
+        num_shards (int): Buckets per table.
+        shard_dir (str): Directory shared by all workers.
+        embedding_backend (str): "torch" or "onnx".
+        dedup (bool): Collapse near-duplicate chunks within the shard.
+
+    Returns:
+        dict: Shard stats (also stored in the .done marker).
+    """
+    global _worker_embeddings
+
+    paths = _shard_paths(shard_dir, name)
+    if os.path.exists(paths["done"]):
+        with open(paths["done"]) as f:
+            return dict(json.load(f), skipped=True)
+
+    # A rebuilt shard has new vectors, so any earlier upload no longer counts
+    if os.path.exists(paths["uploaded"]):
+        os.remove(paths["uploaded"])
+
+    if _worker_embeddings is None:
+        _worker_embeddings = create_embeddings(embedding_backend)
+
+    start = time.perf_counter()
+    splitter = make_splitter()
+    deduplicator = MinHashDeduplicator() if dedup else None
+
+    vectors = []
+    total_docs = 0
+    total_chunks = 0
+    tmp_docs = paths["docs"] + ".tmp"
+    with open(tmp_docs, "w") as out:
+        for docs in iter_document_batches(sources=[source], bucket=bucket, num_buckets=num_shards):
+            split_docs = splitter.split_documents(docs)
+            assign_chunk_ids(split_docs)
+            total_docs += len(docs)
+            total_chunks += len(split_docs)
+            if deduplicator is not None:
+                split_docs = deduplicator.filter(split_docs)
+            if not split_docs:
+                continue
+
+            vectors.extend(_worker_embeddings.embed_documents([doc.page_content for doc in split_docs]))
+            for doc in split_docs:
+                out.write(json.dumps({"id": doc.metadata["chunk_id"], "text": doc.page_content,
+                                      "metadata": doc.metadata}) + "\n")
+
+    tmp_vectors = paths["vectors"] + ".tmp.npy"
+    np.save(tmp_vectors, np.asarray(vectors, dtype=np.float32))
+    os.replace(tmp_vectors, paths["vectors"])
+    os.replace(tmp_docs, paths["docs"])
+
+    stats = {
+        "shard": name,
+        "documents": total_docs,
+        "chunks": total_chunks,
+        "vectors": len(vectors),
+        "duplicates_removed": deduplicator.removed if deduplicator is not None else 0,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    with open(paths["done"], "w") as f:
+        json.dump(stats, f)
+    return dict(stats, skipped=False)
+
+
+def run_sharded_build(num_shards, workers=1, worker_id=0, num_workers=1, shard_dir=SHARD_DIR,
+                      embedding_backend=None):
+    """
+    Builds every incomplete shard assigned to this node, using a local process pool.
+
+    Args:
+        num_shards (int): Hash buckets per source table.
+        workers (int): Local worker processes.
+        worker_id (int): Index of this node when several nodes share shard_dir.
+        num_workers (int): Total nodes sharing shard_dir.
+        shard_dir (str): Directory for shard outputs.
+        embedding_backend (str): "torch" or "onnx".
+
+    Returns:
+        list: Stats of every shard handled by this node.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    _write_manifest(shard_dir, num_shards, embedding_backend)
+
+    assigned = [shard for i, shard in enumerate(list_shards(num_shards)) if i % num_workers == worker_id]
+    pending = [shard for shard in assigned if not os.path.exists(_shard_paths(shard_dir, shard[0])["done"])]
+    print(f"{len(assigned)} shards assigned to worker {worker_id}, {len(assigned) - len(pending)} already complete.")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(embedding_backend,)) as pool:
+        futures = {
+            pool.submit(build_shard, name, source, bucket, num_shards, shard_dir, embedding_backend): name
+            for name, source, bucket in pending
+        }
+        for future in as_completed(futures):
+            try:
+                stats = future.result()
+                print(f"Shard {stats['shard']} done: {stats['vectors']} vectors in {stats['seconds']}s")
+                results.append(stats)
+            except Exception as e:
+                # The shard has no marker, so the next run retries it
+                print(f"Shard {futures[future]} failed: {str(e)}")
+    return results
+
+
+def iter_shard_records(shard_dir, name):
+    """
+    Yields (id, vector, text, metadata) for every vector in a completed shard.
+    """
+    paths = _shard_paths(shard_dir, name)
+    vectors = np.load(paths["vectors"])
+    with open(paths["docs"]) as f:
+        for vector, line in zip(vectors, f):
+            record = json.loads(line)
+            yield record["id"], vector, record["text"], record["metadata"]
+
+
+def _completed_shards(shard_dir):
+    with open(os.path.join(shard_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    shards = list_shards(manifest["num_shards"])
+    missing = [name for name, _, _ in shards if not os.path.exists(_shard_paths(shard_dir, name)["done"])]
+    if missing:
+        raise RuntimeError(f"{len(missing)} shards are not complete yet, e.g. {missing[:5]}. Re-run the build first.")
+    return [name for name, _, _ in shards]
+
+
+class LocalVectorStore:
+    """
+    Minimal on-disk vector store (numpy matrix + JSONL documents) for local
+    builds and tests; vectors are L2-normalized so dot product is cosine similarity.
+    """
+
+    def __init__(self, ids=None, vectors=None, texts=None, metadatas=None):
+        self.ids = ids or []
+        self.vectors = vectors if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+        self.texts = texts or []
+        self.metadatas = metadatas or []
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        with open(os.path.join(directory, "docs.jsonl"), "w") as f:
+            for chunk_id, text, metadata in zip(self.ids, self.texts, self.metadatas):
+                f.write(json.dumps({"id": chunk_id, "text": text, "metadata": metadata}) + "\n")
+
+    @classmethod
+    def load(cls, directory):
+        vectors = np.load(os.path.join(directory, "vectors.npy"))
+        ids, texts, metadatas = [], [], []
+        with open(os.path.join(directory, "docs.jsonl")) as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record["id"])
+                texts.append(record["text"])
+                metadatas.append(record["metadata"])
+        return cls(ids, vectors, texts, metadatas)
+
+    def search(self, query_vector, k=4):
+        """
+        Returns the k most similar records as (id, text, metadata, score).
+        """
+        scores = self.vectors @ np.asarray(query_vector, dtype=np.float32)
+        top = np.argsort(-scores)[:k]
+        return [(self.ids[i], self.texts[i], self.metadatas[i], float(scores[i])) for i in top]
+
+
+def merge_to_local(shard_dir=SHARD_DIR, output_dir=LOCAL_INDEX_DIR):
+    """
+    Concatenates all completed shards into one LocalVectorStore.
+
+    Returns:
+        LocalVectorStore: The merged store (also saved to output_dir).
+    """
+    ids, vectors, texts, metadatas = [], [], [], []
+    for name in _completed_shards(shard_dir):
+        for chunk_id, vector, text, metadata in iter_shard_records(shard_dir, name):
+            ids.append(chunk_id)
+            vectors.append(vector)
+            texts.append(text)
+            metadatas.append(metadata)
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if len(matrix):
+        matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    store = LocalVectorStore(ids, matrix, texts, metadatas)
+    store.save(output_dir)
+    print(f"Merged {len(ids)} vectors from shards into {output_dir}.")
+    return store
+
+
+def merge_to_pinecone(shard_dir=SHARD_DIR, index_name="rag-movies-qa"):
+    """
+    Upserts all completed shards into Pinecone, marking each shard once uploaded
+    so an interrupted merge resumes where it stopped.
+
+    Returns:
+        int: Number of vectors upserted in this run.
+    """
+    from pinecone import Pinecone
+
+    index = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(index_name)
+    upserted = 0
+    dimension = None
+    for name in _completed_shards(shard_dir):
+        paths = _shard_paths(shard_dir, name)
+        uploaded_marker = paths["uploaded"]
+        # The marker holds the .done stats it was written for, so a shard rebuilt
+        # elsewhere (or whose marker survived a rebuild) is uploaded again
+        with open(paths["done"]) as f:
+            done_stats = f.read()
+        if os.path.exists(uploaded_marker):
+            with open(uploaded_marker) as f:
+                if f.read() == done_stats:
+                    continue
+        batch = []
+        for chunk_id, vector, text, metadata in iter_shard_records(shard_dir, name):
+            batch.append((chunk_id, vector.tolist(), dict(metadata, text=text)))
+            dimension = len(vector)
+            if len(batch) >= UPLOAD_BATCH_SIZE:
+                index.upsert(vectors=batch)
+                upserted += len(batch)
+                batch = []
+        if batch:
+            index.upsert(vectors=batch)
+            upserted += len(batch)
+        with open(uploaded_marker, "w") as f:
+            f.write(done_stats)
+        print(f"Uploaded shard {name} to Pinecone.")
+    print(f"✅ Upserted {upserted} vectors to Pinecone.")
+    if upserted:
+        write_index_manifest(index=index, dimension=dimension, index_name=index_name, chunks=upserted)
+    return upserted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded, resumable embedding build.")
+    parser.add_argument("command", choices=["build", "merge"])
+    parser.add_argument("--num-shards", type=int, default=4, help="Hash buckets per source table.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Local worker processes.")
+    parser.add_argument("--worker-id", type=int, default=0, help="This node's index when sharing SHARD_DIR.")
+    parser.add_argument("--num-workers", type=int, default=1, help="Nodes sharing SHARD_DIR.")
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    parser.add_argument("--embedding-backend", default=None, help="torch or onnx.")
+    parser.add_argument("--target", choices=["local", "pinecone"], default="local", help="Where merge writes.")
+    parser.add_argument("--output", default=LOCAL_INDEX_DIR, help="Local index directory for --target local.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        run_sharded_build(args.num_shards, args.workers, args.worker_id, args.num_workers,
+                          args.shard_dir, args.embedding_backend)
+    elif args.target == "local":
+        merge_to_local(args.shard_dir, args.output)
+    else:
+        merge_to_pinecone(args.shard_dir)
@@ -0,0 +1,74 @@
+# benchmarks/embedding_backends.py
+#
+# Compares single-query latency and batch throughput of the embedding backends.
+# Run from the repo root after `python -m rag_pipeline.model_loader --onnx --quantize`:
+#
+#     python -m benchmarks.embedding_backends --threads 4
+
+from rag_pipeline.model_loader import create_embeddings
+from rag_pipeline.onnx_embeddings import cosine_agreement, VALIDATION_TEXTS
+from benchmarks.stats import percentile
+import argparse
+import statistics
+import time
+
+QUERIES = [
+    "What is the plot of The Matrix?",
+    "Who directed Inception?",
+    "Which actors star in Pulp Fiction?",
+    "Tell me about the awards for The Godfather.",
+    "List some comedy movies.",
+]
+
+
+def bench_backend(embeddings, repeats, batch_size):
+    """
+    Measures per-query latency and batch throughput for one backend.
+
+    Returns:
+        dict: p50/p95 single-query latency in ms and batch throughput in texts/s.
+    """
+    embeddings.embed_query("warm-up")
+
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        embeddings.embed_query(QUERIES[i % len(QUERIES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    batch = [VALIDATION_TEXTS[i % len(VALIDATION_TEXTS)] for i in range(batch_size)]
+    start = time.perf_counter()
+    embeddings.embed_documents(batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "batch_texts_per_s": round(batch_size / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends.")
+    parser.add_argument("--repeats", type=int, default=200, help="Single queries per backend.")
+    parser.add_argument("--batch-size", type=int, default=512, help="Texts in the throughput batch.")
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads.")
+    args = parser.parse_args()
+
+    reference = create_embeddings("torch")
+    backends = {
+        "torch": reference,
+        "onnx": create_embeddings("onnx", quantized=False, num_threads=args.threads),
+        "onnx-int8": create_embeddings("onnx", quantized=True, num_threads=args.threads),
+    }
+
+    print(f"{'backend':<10} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>10} {'min cos':>8}")
+    for name, embeddings in backends.items():
+        result = bench_backend(embeddings, args.repeats, args.batch_size)
+        agreement = cosine_agreement(embeddings, reference)
+        print(f"{name:<10} {result['p50_ms']:>8} {result['p95_ms']:>8} "
+              f"{result['batch_texts_per_s']:>10} {agreement['min_cosine']:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
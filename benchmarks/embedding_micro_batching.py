@@ -0,0 +1,68 @@
+# benchmarks/embedding_micro_batching.py
+#
+# Load test for query embedding: many concurrent "sessions" each embedding
+# one query at a time, with and without the shared micro-batcher.
+#
+#     python -m benchmarks.embedding_micro_batching --clients 32 --requests 20
+
+from concurrent.futures import ThreadPoolExecutor
+from rag_pipeline.model_loader import create_embeddings
+from rag_pipeline.micro_batcher import MicroBatchingEmbeddings
+from benchmarks.embedding_backends import QUERIES
+from benchmarks.stats import percentile
+import argparse
+import statistics
+import time
+
+
+def run_load(embeddings, clients, requests_per_client):
+    """
+    Fires `clients` concurrent workers, each issuing sequential embed_query calls.
+
+    Returns:
+        dict: Throughput and latency percentiles in ms.
+    """
+    def client(client_id):
+        latencies = []
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            embeddings.embed_query(f"{QUERIES[(client_id + i) % len(QUERIES)]} #{client_id}-{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = [ms for result in pool.map(client, range(clients)) for ms in result]
+    elapsed = time.perf_counter() - start
+
+    return {
+        "queries_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test query embedding micro-batching.")
+    parser.add_argument("--backend", default=None, help="torch or onnx (default: EMBEDDING_BACKEND).")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent sessions.")
+    parser.add_argument("--requests", type=int, default=20, help="Queries per session.")
+    parser.add_argument("--window-ms", type=float, default=5, help="Micro-batch collection window.")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Largest micro-batch.")
+    args = parser.parse_args()
+
+    base = create_embeddings(args.backend)
+    base.embed_query("warm-up")
+    batched = MicroBatchingEmbeddings(base, window_ms=args.window_ms, max_batch_size=args.max_batch_size)
+
+    print(f"{'mode':<10} {'q/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, embeddings in (("direct", base), ("batched", batched)):
+        result = run_load(embeddings, args.clients, args.requests)
+        print(f"{name:<10} {result['queries_per_s']:>8} {result['p50_ms']:>8} "
+              f"{result['p95_ms']:>8} {result['p99_ms']:>8}")
+    print(f"micro-batcher stats: {batched.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/llm_scheduler_sim.py
+#
+# Simulates a spike of chat questions against a fake LLM with configurable
+# latency, with and without the LLM scheduler. No API keys needed:
+#
+#     python -m benchmarks.llm_scheduler_sim --users 60 --distinct 5 --latency 0.5
+
+from concurrent.futures import ThreadPoolExecutor
+from rag_pipeline.llm_scheduler import LLMScheduler, SchedulerBusy
+from benchmarks.stats import percentile
+import argparse
+import statistics
+import threading
+import time
+
+
+class FakeLLM:
+    """
+    Stand-in for ChatGroq: sleeps for `latency_s` and counts concurrent calls.
+    """
+
+    def __init__(self, latency_s=0.5):
+        self.latency_s = latency_s
+        self.calls = 0
+        self.peak_concurrency = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self._active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._active)
+        try:
+            time.sleep(self.latency_s)
+            return f"answer to: {prompt}"
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+def simulate(llm, scheduler, users, distinct):
+    """
+    Sends `users` simultaneous questions drawn from `distinct` different prompts.
+
+    Returns:
+        dict: LLM calls made, peak concurrency, shed count and latency percentiles.
+    """
+    def ask(i):
+        prompt = f"question {i % distinct}"
+        start = time.perf_counter()
+        try:
+            if scheduler is None:
+                llm.invoke(prompt)
+            else:
+                scheduler.run(prompt, lambda: llm.invoke(prompt))
+            shed = False
+        except SchedulerBusy:
+            shed = True
+        return (time.perf_counter() - start) * 1000, shed
+
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        results = list(pool.map(ask, range(users)))
+
+    latencies = [ms for ms, shed in results if not shed]
+    return {
+        "llm_calls": llm.calls,
+        "peak_concurrency": llm.peak_concurrency,
+        "shed": sum(shed for _, shed in results),
+        "p50_ms": round(statistics.median(latencies), 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a question spike against a fake LLM.")
+    parser.add_argument("--users", type=int, default=60, help="Simultaneous questions.")
+    parser.add_argument("--distinct", type=int, default=5, help="Distinct questions among them.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM latency in seconds.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Scheduler concurrency cap.")
+    parser.add_argument("--max-queue", type=int, default=32, help="Scheduler queue bound.")
+    parser.add_argument("--timeout", type=float, default=10, help="Scheduler queue deadline in seconds.")
+    args = parser.parse_args()
+
+    print("without scheduler:", simulate(FakeLLM(args.latency), None, args.users, args.distinct))
+
+    scheduler = LLMScheduler(args.concurrency, args.max_queue, args.timeout)
+    print("with scheduler:   ", simulate(FakeLLM(args.latency), scheduler, args.users, args.distinct))
+    print("scheduler metrics:", scheduler.metrics())
+
+
+if __name__ == "__main__":
+    main()
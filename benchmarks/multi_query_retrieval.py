@@ -0,0 +1,131 @@
+# benchmarks/multi_query_retrieval.py
+#
+# Compares single-embedding retrieval with multi-query fan-out on questions that
+# name several movies. Uses the real embedding model and an in-memory vector
+# store with simulated per-search latency (a Pinecone round trip), so no API
+# keys are needed:
+#
+#     python -m benchmarks.multi_query_retrieval --search-latency-ms 60 --k 6
+
+from langchain_core.documents import Document
+from rag_pipeline.model_loader import create_embeddings
+from rag_pipeline.multi_query import multi_query_search
+from rag_pipeline.rag_chain import RETRIEVAL_CANDIDATES
+from benchmarks.stats import percentile
+import numpy as np
+import argparse
+import statistics
+import time
+
+# (title, genre, year, director, stars)
+MOVIES = [
+    ("The Matrix", "Sci-Fi", 1999, "Lana Wachowski, Lilly Wachowski", "Keanu Reeves, Laurence Fishburne"),
+    ("Inception", "Sci-Fi", 2010, "Christopher Nolan", "Leonardo DiCaprio, Joseph Gordon-Levitt"),
+    ("Memento", "Mystery", 2000, "Christopher Nolan", "Guy Pearce, Carrie-Anne Moss"),
+    ("Titanic", "Romance", 1997, "James Cameron", "Leonardo DiCaprio, Kate Winslet"),
+    ("Avatar", "Sci-Fi", 2009, "James Cameron", "Sam Worthington, Zoe Saldana"),
+    ("Alien", "Horror", 1979, "Ridley Scott", "Sigourney Weaver, Tom Skerritt"),
+    ("Aliens", "Action", 1986, "James Cameron", "Sigourney Weaver, Michael Biehn"),
+    ("Pulp Fiction", "Crime", 1994, "Quentin Tarantino", "John Travolta, Uma Thurman"),
+    ("The Godfather", "Crime", 1972, "Francis Ford Coppola", "Marlon Brando, Al Pacino"),
+    ("Heat", "Crime", 1995, "Michael Mann", "Al Pacino, Robert De Niro"),
+    ("Blade Runner", "Sci-Fi", 1982, "Ridley Scott", "Harrison Ford, Rutger Hauer"),
+    ("The Dark Knight", "Action", 2008, "Christopher Nolan", "Christian Bale, Heath Ledger"),
+]
+
+# Question -> titles whose documents should be retrieved
+QUESTIONS = [
+    ("Compare the directors of The Matrix and Inception", ["The Matrix", "Inception"]),
+    ("Were Titanic and Alien both made by the same director?", ["Titanic", "Alien"]),
+    ("Who stars in Pulp Fiction, Heat and Memento?", ["Pulp Fiction", "Heat", "Memento"]),
+    ("The Godfather vs Blade Runner", ["The Godfather", "Blade Runner"]),
+    ("Which is older, Avatar or The Dark Knight?", ["Avatar", "The Dark Knight"]),
+    ("What is the difference between Alien and Aliens?", ["Alien", "Aliens"]),
+]
+
+
+class InMemoryVectorStore:
+    """
+    Brute-force cosine search over a few documents, sleeping `latency_s` per
+    search to stand in for the network round trip to Pinecone.
+    """
+
+    def __init__(self, embeddings, docs, latency_s):
+        self.embeddings = embeddings
+        self.docs = docs
+        self.latency_s = latency_s
+        self._matrix = np.asarray(embeddings.embed_documents([doc.page_content for doc in docs]))
+        self._matrix /= np.linalg.norm(self._matrix, axis=1, keepdims=True)
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        time.sleep(self.latency_s)
+        vector = np.asarray(embedding)
+        scores = self._matrix @ (vector / np.linalg.norm(vector))
+        top = np.argsort(-scores)[:k]
+        return [(self.docs[i], float(scores[i])) for i in top]
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k=k)
+
+
+def build_corpus():
+    docs = []
+    for title, genre, year, director, stars in MOVIES:
+        for n, text in enumerate((
+            f"'{title}' is a {genre} movie released in {year}. It was directed by {director}.",
+            f"'{title}' stars {stars}. Critics and audiences have discussed the film for years.",
+        )):
+            docs.append(Document(page_content=text, metadata={"chunk_id": f"movies:{title}:{n}", "title": title}))
+    return docs
+
+
+def run(vectorstore, k, multi_query):
+    """
+    Answers every benchmark question's retrieval step once.
+
+    Returns:
+        dict: Entity recall (share of named movies found in the top k) and latency percentiles.
+    """
+    latencies = []
+    found = 0
+    expected = 0
+    for question, titles in QUESTIONS:
+        start = time.perf_counter()
+        if multi_query:
+            hits, _ = multi_query_search(vectorstore, question, k)
+        else:
+            hits = vectorstore.similarity_search_with_score(question, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        retrieved = {doc.metadata["title"] for doc, _ in hits}
+        found += sum(title in retrieved for title in titles)
+        expected += len(titles)
+
+    return {
+        "entity_recall": round(found / expected, 3),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-query retrieval on multi-entity questions.")
+    parser.add_argument("--backend", default=None, help="torch or onnx (default: EMBEDDING_BACKEND).")
+    parser.add_argument("--k", type=int, default=RETRIEVAL_CANDIDATES, help="Total hits per question.")
+    parser.add_argument("--search-latency-ms", type=float, default=60, help="Simulated latency per vector search.")
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the question set.")
+    args = parser.parse_args()
+
+    embeddings = create_embeddings(args.backend)
+    embeddings.embed_query("warm-up")
+    vectorstore = InMemoryVectorStore(embeddings, build_corpus(), args.search_latency_ms / 1000)
+
+    print(f"{'mode':<8} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, multi_query in (("single", False), ("multi", True)):
+        results = [run(vectorstore, args.k, multi_query) for _ in range(args.repeats)]
+        print(f"{name:<8} {results[-1]['entity_recall']:>8} "
+              f"{round(statistics.median(r['p50_ms'] for r in results), 1):>8} "
+              f"{round(statistics.median(r['p95_ms'] for r in results), 1):>8}")
+
+
+if __name__ == "__main__":
+    main()
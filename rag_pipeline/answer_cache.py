@@ -0,0 +1,284 @@
+# rag_pipeline/answer_cache.py
+#
+# Precomputed answers for the sidebar example questions and templated questions
+# about the most-voted movies. Run after the ETL and embedding build:
+#
+#     python -m rag_pipeline.answer_cache --top-n 100
+#
+# Answers are stored in a small SQLite file keyed by the normalized question.
+# The file records the index build id (see index_manifest) and a fingerprint of
+# the prompt and model. The app re-checks them against the live index every
+# ANSWER_CACHE_CHECK_S seconds and answers live while they differ; a re-run
+# drops the stale answers before refilling.
+
+from rag_pipeline.index_manifest import current_build_id
+from rag_pipeline.prompts import PROMPT_TEMPLATE, GROQ_MODEL_NAME, EXAMPLE_QUESTIONS
+import threading
+import argparse
+import hashlib
+import sqlite3
+import json
+import time
+import re
+import os
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "answer_cache.sqlite")
+ANSWER_CACHE_TOP_N = int(os.getenv("ANSWER_CACHE_TOP_N", "100"))
+
+# Seconds between checks that the cache still matches the live index build
+ANSWER_CACHE_CHECK_S = float(os.getenv("ANSWER_CACHE_CHECK_S", "60"))
+
+# Asked for every top-voted movie; {title} is replaced with the movie title
+ANSWER_CACHE_TEMPLATES = [
+    "What is the plot of {title}?",
+    "Who directed {title}?",
+    "Which actors star in {title}?",
+    "Tell me about the awards for {title}.",
+    "What is the IMDb rating of {title}?",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    context TEXT NOT NULL,
+    prompt_tokens INTEGER,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def normalize_question(question):
+    """
+    Cache key for a question: lowercase words with punctuation and extra spaces removed,
+    so "Who directed Inception?" and "who directed inception" share an entry.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def cache_fingerprint():
+    """
+    Short hash of everything besides the index that shapes an answer.
+    """
+    return hashlib.sha1(f"{GROQ_MODEL_NAME}\n{PROMPT_TEMPLATE}".encode("utf-8")).hexdigest()[:12]
+
+
+class AnswerCache:
+    """
+    Read-only view of a precomputed answer file, shared by all app sessions.
+
+    At most every `check_interval_s` the file's build id and fingerprint are
+    compared with the current index build from `build_id_source`; while they
+    differ every lookup misses. A rebuilt index or a refreshed cache file is
+    therefore picked up without restarting the app.
+    """
+
+    def __init__(self, conn, path, build_id_source, check_interval_s=ANSWER_CACHE_CHECK_S):
+        self._conn = conn
+        self.path = path
+        self._build_id_source = build_id_source
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._current = False
+
+    @classmethod
+    def load(cls, path=ANSWER_CACHE_PATH, build_id_source=current_build_id, check_interval_s=ANSWER_CACHE_CHECK_S):
+        """
+        Opens the cache file read-only.
+
+        Args:
+            path (str): Cache file.
+            build_id_source (callable): Returns the current index build id, e.g.
+                the one stored in the live Pinecone index.
+            check_interval_s (float): How long a freshness check is trusted.
+
+        Returns:
+            AnswerCache: The cache, or None if the file is missing or not an answer cache.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("SELECT key, value FROM meta").fetchall()
+        except sqlite3.DatabaseError as e:
+            print(f"Ignoring answer cache {path}: {e}")
+            return None
+        return cls(conn, path, build_id_source, check_interval_s)
+
+    def _is_current(self):
+        """
+        Whether the file matches the current index build and prompt. Call with the lock held.
+        """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval_s:
+            return self._current
+        first_check = self._checked_at is None
+        self._checked_at = now
+        try:
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+            build_id = self._build_id_source()
+        except Exception as e:
+            print(f"Answer cache check failed; answering live: {e}")
+            self._current = False
+            return False
+        current = (bool(build_id) and meta.get("build_id") == build_id
+                   and meta.get("fingerprint") == cache_fingerprint())
+        if not current and (self._current or first_check):
+            print(f"Answer cache {self.path} is stale (built for index {meta.get('build_id')}, "
+                  f"current {build_id}); answering live.")
+        self._current = current
+        return current
+
+    def get(self, question):
+        """
+        Looks up a question by its normalized form.
+
+        Returns:
+            dict: {"question", "answer", "context", "prompt_tokens"}, or None on a
+            miss or while the cache is stale.
+        """
+        with self._lock:
+            if not self._is_current():
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT question, answer, context, prompt_tokens FROM answers WHERE key = ?",
+                    (normalize_question(question),)
+                ).fetchone()
+            except sqlite3.DatabaseError as e:
+                print(f"Answer cache lookup failed: {e}")
+                return None
+        if row is None:
+            return None
+        context = json.loads(row[2])
+        for ref in context:
+            if "chunk_ids" in ref:
+                ref["chunk_ids"] = tuple(ref["chunk_ids"])
+        return {"question": row[0], "answer": row[1], "context": context, "prompt_tokens": row[3]}
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+def open_for_writing(path, build_id):
+    """
+    Opens (or creates) the cache file for the precompute job. Answers from another
+    index build or prompt are deleted first; matching ones are kept so a re-run resumes.
+
+    Returns:
+        sqlite3.Connection: Writable connection.
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    meta = dict(conn.execute("SELECT key, value FROM meta"))
+    if meta.get("build_id") != build_id or meta.get("fingerprint") != cache_fingerprint():
+        dropped = conn.execute("DELETE FROM answers").rowcount
+        if dropped:
+            print(f"Dropped {dropped} stale answers from index build {meta.get('build_id')}.")
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         [("build_id", build_id), ("fingerprint", cache_fingerprint())])
+        conn.commit()
+    return conn
+
+
+def top_voted_titles(limit):
+    """
+    Titles of the `limit` movies with the most IMDb votes.
+    """
+    from sqlalchemy import text
+    from ETL.db_connection import connect
+
+    query = text("SELECT title FROM movies WHERE imdb_votes IS NOT NULL "
+                 "ORDER BY imdb_votes DESC LIMIT :limit")
+    with connect() as conn:
+        return [row[0] for row in conn.execute(query, {"limit": limit})]
+
+
+def build_questions(titles, templates=ANSWER_CACHE_TEMPLATES):
+    """
+    Sidebar example questions followed by every template for every title, one per cache key.
+    """
+    questions = {}
+    for question in EXAMPLE_QUESTIONS + [t.format(title=title) for title in titles for t in templates]:
+        questions.setdefault(normalize_question(question), question)
+    return questions
+
+
+def precompute_answers(path=ANSWER_CACHE_PATH, top_n=ANSWER_CACHE_TOP_N, templates=ANSWER_CACHE_TEMPLATES):
+    """
+    Answers the popular questions with the live RAG chain and stores them.
+
+    Args:
+        path (str): Cache file to fill.
+        top_n (int): Number of most-voted movies to ask about.
+        templates (list): Question templates with a {title} placeholder.
+
+    Returns:
+        int: Answers added in this run.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_groq import ChatGroq
+    from langchain_pinecone import PineconeVectorStore
+    from pinecone import Pinecone
+    from rag_pipeline.model_loader import load_embeddings
+    from rag_pipeline.rag_chain import build_rag_chain
+    from rag_pipeline.chat_store import compact_context
+
+    llm = ChatGroq(groq_api_key=os.getenv("GROQ_API_KEY"), model=GROQ_MODEL_NAME, temperature=0)
+    index = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(os.getenv("PINECONE_INDEX_NAME"))
+    # Answers are tied to the build the live index reports, which is what the app checks against
+    build_id = current_build_id(index)
+    if not build_id:
+        raise SystemExit("The index has no build id; run the embedding build first.")
+    vectorstore = PineconeVectorStore(index=index, embedding=load_embeddings(), text_key="text")
+    chain = build_rag_chain(llm, vectorstore, ChatPromptTemplate.from_template(PROMPT_TEMPLATE))
+
+    questions = build_questions(top_voted_titles(top_n), templates)
+    conn = open_for_writing(path, build_id)
+    done = {row[0] for row in conn.execute("SELECT key FROM answers")}
+    added = 0
+    for key, question in questions.items():
+        if key in done:
+            continue
+        try:
+            response = chain.invoke({"input": question})
+        except Exception as e:
+            print(f"Skipping {question!r}: {e}")
+            continue
+        conn.execute(
+            "INSERT OR REPLACE INTO answers (key, question, answer, context, prompt_tokens, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, question, response["answer"], json.dumps(compact_context(response["context"])),
+             response["context_stats"].get("prompt_tokens"), time.time())
+        )
+        conn.commit()
+        added += 1
+        print(f"[{len(done) + added}/{len(questions)}] {question}")
+
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"✅ Answer cache {path}: {added} new answers for index build {build_id}.")
+    return added
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Precompute answers for popular questions.")
+    parser.add_argument("--output", default=ANSWER_CACHE_PATH, help="Cache file to write.")
+    parser.add_argument("--top-n", type=int, default=ANSWER_CACHE_TOP_N, help="Most-voted movies to cover.")
+    parser.add_argument("--templates-file", default=None,
+                        help="File with one question template per line (use {title}); replaces the defaults.")
+    args = parser.parse_args()
+
+    templates = ANSWER_CACHE_TEMPLATES
+    if args.templates_file:
+        with open(args.templates_file) as f:
+            templates = [line.strip() for line in f if line.strip()]
+    precompute_answers(args.output, args.top_n, templates)
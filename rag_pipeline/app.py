@@ -1,18 +1,23 @@
 # RAG/rag_pipeline.py
 
 import streamlit as st
-from langchain_groq import ChatGroq
-from pinecone import Pinecone as PineconeClient
-from langchain_pinecone import PineconeVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
 import time
 import os
 from dotenv import load_dotenv
 import re # For sanitizing HTML
 
+# Heavy libraries (langchain, groq, pinecone, sentence-transformers) are imported
+# lazily inside the cached loaders below so a cold container renders the page first.
+# Run from the repo root with `python -m streamlit run rag_pipeline/app.py` (or with
+# the repo root on PYTHONPATH, as in the Docker image) so `rag_pipeline` is importable.
+from rag_pipeline.model_loader import timed, load_embeddings, format_timings
+from rag_pipeline.chat_store import (
+    CHAT_RENDER_WINDOW, append_message, compact_context, visible_messages,
+    fetch_chunk_texts, resolve_context_text, estimate_size_bytes
+)
+from rag_pipeline.prompts import PROMPT_TEMPLATE, GROQ_MODEL_NAME, EXAMPLE_QUESTIONS
+from rag_pipeline.answer_cache import AnswerCache, ANSWER_CACHE_ENABLED
+
 load_dotenv()
 
 # --- Page Configuration ---
@@ -237,12 +242,46 @@ def load_models():
     if not groq_api_key:
         st.error("GROQ_API_KEY not found. Please set it in your .env file.")
         st.stop()
-    llm = ChatGroq(groq_api_key=groq_api_key, model="gemma2-9b-it", temperature=0)
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    with timed("import langchain_groq"):
+        from langchain_groq import ChatGroq
+    llm = ChatGroq(groq_api_key=groq_api_key, model=GROQ_MODEL_NAME, temperature=0)
+    embeddings = load_embeddings()
+
+    # Cached across sessions, so concurrent users' queries share embedding batches
+    from rag_pipeline.micro_batcher import MicroBatchingEmbeddings, EMBEDDING_MICRO_BATCHING
+    if EMBEDDING_MICRO_BATCHING:
+        embeddings = MicroBatchingEmbeddings(embeddings)
     return llm, embeddings
 
+@st.cache_resource
+def load_llm_scheduler():
+    # One scheduler per server process so the concurrency cap and coalescing span all sessions
+    from rag_pipeline.llm_scheduler import LLMScheduler
+    return LLMScheduler()
+
+@st.cache_resource
+def load_answer_cache():
+    # Precomputed answers for popular questions; lookups miss while the file was
+    # built for another index build than the live Pinecone index reports
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    from rag_pipeline.index_manifest import current_build_id
+    return AnswerCache.load(build_id_source=lambda: current_build_id(load_pinecone_index()))
+
+@st.cache_resource
+def load_pinecone_index():
+    with timed("import pinecone"):
+        from pinecone import Pinecone as PineconeClient
+    pc = PineconeClient(api_key=os.getenv("PINECONE_API_KEY"))
+    return pc.Index(os.getenv("PINECONE_INDEX_NAME"))
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def fetch_context_texts(chunk_ids):
+    # Context text is fetched by chunk id only when a user opens it
+    return fetch_chunk_texts(load_pinecone_index(), chunk_ids)
+
 @st.cache_resource(show_spinner="🔄 Connecting to Pinecone...")
-def load_pinecone_retriever(_embeddings):
+def load_pinecone_vectorstore(_embeddings):
     pinecone_api_key = os.getenv("PINECONE_API_KEY")
     index_name = os.getenv("PINECONE_INDEX_NAME")
     if not pinecone_api_key:
@@ -250,12 +289,12 @@ def load_pinecone_retriever(_embeddings):
         st.error("Pinecone API Key is missing. Check .env.")
         return None
     try:
-        pc = PineconeClient(api_key=pinecone_api_key)
-        pinecone_index_obj = pc.Index(index_name)
+        with timed("import langchain_pinecone"):
+            from langchain_pinecone import PineconeVectorStore
+        pinecone_index_obj = load_pinecone_index()
         vectorstore = PineconeVectorStore(index=pinecone_index_obj, embedding=_embeddings, text_key="text")
-        retriever = vectorstore.as_retriever(search_kwargs={'k': 3})
         st.sidebar.success(f"Connected to Pinecone: '{index_name}'")
-        return retriever
+        return vectorstore
     except Exception as e:
         st.sidebar.error("Pinecone connection error.")
         st.error(f"Error connecting to Pinecone: {e}")
@@ -264,39 +303,25 @@ def load_pinecone_retriever(_embeddings):
 if "models_loaded" not in st.session_state:
     with st.spinner("🔄 Initializing AI stack..."):
         llm, embeddings = load_models()
-        retriever = load_pinecone_retriever(embeddings)
+        vectorstore = load_pinecone_vectorstore(embeddings)
+        print(f"Startup timings: {format_timings()}")
         st.session_state.llm = llm
         st.session_state.embeddings = embeddings
-        st.session_state.retriever = retriever
+        st.session_state.vectorstore = vectorstore
         st.session_state.models_loaded = True
 else:
     llm = st.session_state.llm
     embeddings = st.session_state.embeddings
-    retriever = st.session_state.retriever
-
-if retriever:
-    prompt_template_str = """
-    You are MovieMax, a friendly and helpful AI assistant for answering questions about movies using the provided context.
-    Your goal is to provide accurate, concise answers in a gentle and pleasant tone.
-
-    STRICTLY use only the information present in the '<context>' tags.
-    If the answer is not found within the context, kindly state: "I'm sorry, I couldn't find that specific detail in our movie information right now."
-    Do not make up answers, speculate, or provide information outside the given context.
-    If the context is empty or irrelevant, state that you cannot answer based on the provided details.
-
-    Format your answers clearly. For lists (like cast or genres), use bullet points.
-    When referring to a movie title, you can make it bold if possible (e.g., **The Matrix**).
-
-    <context>
-    {context}
-    </context>
-
-    Question: {input}
-    Answer:
-    """
-    prompt = ChatPromptTemplate.from_template(prompt_template_str)
-    doc_chain = create_stuff_documents_chain(llm, prompt=prompt)
-    retriever_chain = create_retrieval_chain(retriever=retriever, combine_docs_chain=doc_chain)
+    vectorstore = st.session_state.vectorstore
+
+if vectorstore:
+    with timed("import langchain chains"):
+        from langchain_core.prompts import ChatPromptTemplate
+        from rag_pipeline.rag_chain import build_rag_chain
+
+    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+    # Retrieved chunks are deduplicated, merged per movie and fit to CONTEXT_TOKEN_BUDGET
+    retriever_chain = build_rag_chain(llm, vectorstore, prompt, scheduler=load_llm_scheduler())
 else:
     retriever_chain = None
 
@@ -311,35 +336,43 @@ with st.sidebar:
     st.markdown("---")
 
     st.subheader("💡 Example Questions:") # Subheader uses sidebar text color by default from stMarkdown
-    example_questions = [
-        "What is the plot of The Matrix?",
-        "Who directed Inception?",
-        "Which actors star in Pulp Fiction?",
-        "Tell me about the awards for The Godfather.",
-        "List some comedy movies."
-    ]
+    example_questions = EXAMPLE_QUESTIONS
     for i, q in enumerate(example_questions):
         if st.button(q, key=f"example_{i}"): # Buttons use sidebar button style
             st.session_state.user_question_input = q
 
     st.markdown("---")
     st.caption("Connection Status:") # Caption uses sidebar text color
-    # Status is shown by load_pinecone_retriever
+    # Status is shown by load_pinecone_vectorstore
+    st.caption(f"⏱️ Startup: {format_timings()}")
+    if "messages" in st.session_state:
+        st.caption(f"🧠 Session memory: {estimate_size_bytes(st.session_state.messages) / 1024:.1f} KB "
+                   f"({len(st.session_state.messages)} messages)")
 
 # --- Initialize Chat History ---
 if "messages" not in st.session_state:
     st.session_state.messages = [{
         "role": "assistant",
         "content": "Hi there! I'm MovieMax. 🎬 How can I help you with movie info today?",
-        "avatar": "🤖" # Changed initial message emoji
+        "avatar": "🤖", # Changed initial message emoji
+        "id": 0
     }]
+if "render_window" not in st.session_state:
+    st.session_state.render_window = CHAT_RENDER_WINDOW
 
 # --- Main Chat Interface ---
 st.markdown("<h2>Chat with MovieMax 🤖👤</h2>", unsafe_allow_html=True) # Uses .main h2 style
 
 st.markdown("<div class='chat-container' id='chat-container'>", unsafe_allow_html=True)
 
-for message in st.session_state.messages:
+# Only the newest messages are rendered; older pages load on demand
+shown_messages, hidden_count = visible_messages(st.session_state.messages, st.session_state.render_window)
+if hidden_count:
+    if st.button(f"⬆️ Show older messages ({hidden_count} hidden)", key="show_older_messages"):
+        st.session_state.render_window += CHAT_RENDER_WINDOW
+        st.rerun()
+
+for message in shown_messages:
     role_class = "user" if message["role"] == "user" else "assistant"
     avatar_html = message.get("avatar_icon", "👤" if message["role"] == "user" else "🤖")
 
@@ -362,10 +395,15 @@ for message in st.session_state.messages:
             with st.expander("🔍 Show Context & Details", expanded=False): # Uses expander styles
                 if "response_time" in message:
                     st.caption(f"⏱️ Response time: {message['response_time']} seconds") # Uses default caption style with main text color
-                for i, doc in enumerate(message["context"]):
-                    st.markdown(f"**Retrieved Document {i+1}:**") # Uses main text color
-                    st.code(doc.page_content, language="text") # Uses expander code style
-                    if i < len(message["context"]) - 1: st.markdown("---") # Uses expander hr style
+                if message.get("prompt_tokens"):
+                    st.caption(f"🧮 Prompt tokens: {message['prompt_tokens']}")
+                if st.toggle("Load retrieved documents", key=f"context_{message.get('id')}"):
+                    st.caption("Documents are re-fetched from the index by chunk id; if it was rebuilt "
+                               "since this answer, the text may differ from what the model saw.")
+                    for i, ref in enumerate(message["context"]):
+                        st.markdown(f"**Retrieved Document {i+1}:** (score {ref['score']})") # Uses main text color
+                        st.code(resolve_context_text(ref, fetch_context_texts), language="text") # Uses expander code style
+                        if i < len(message["context"]) - 1: st.markdown("---") # Uses expander hr style
 
 thinking_placeholder_container = st.empty()
 st.markdown("</div>", unsafe_allow_html=True)
@@ -379,9 +417,24 @@ user_question = st.chat_input("Ask your movie question here...", key="user_quest
 
 if user_question:
     sanitized_user_question = sanitize_html(user_question)
-    st.session_state.messages.append({"role": "user", "content": sanitized_user_question, "avatar_icon": "👤"})
-
-    if retriever_chain:
+    append_message(st.session_state.messages, {"role": "user", "content": sanitized_user_question, "avatar_icon": "👤"})
+
+    answer_cache = load_answer_cache()
+    start_time = time.process_time()
+    cached = answer_cache.get(user_question) if answer_cache else None
+    if cached:
+        # Popular questions are answered from the precomputed cache without retrieval or LLM calls
+        print(f"Answer cache hit: {cached['question']!r}")
+        append_message(st.session_state.messages, {
+            "role": "assistant",
+            "content": sanitize_html(cached["answer"]),
+            "avatar_icon": "🤖",
+            "context": cached["context"],
+            "response_time": round(time.process_time() - start_time, 2),
+            "prompt_tokens": cached["prompt_tokens"]
+        })
+        st.rerun()
+    elif retriever_chain:
         with thinking_placeholder_container:
             st.markdown(f"""
                 <div class="message-row assistant">
@@ -395,20 +448,24 @@ if user_question:
             end_time = time.process_time()
             answer = response.get('answer', "Sorry, I couldn't formulate an answer.")
             retrieved_context = response.get('context', [])
+            context_stats = response.get('context_stats', {})
+            print(f"Context packing: {context_stats}")
+            print(f"LLM scheduler: {load_llm_scheduler().metrics()}")
 
             sanitized_answer = sanitize_html(answer)
-            st.session_state.messages.append({
+            append_message(st.session_state.messages, {
                 "role": "assistant",
                 "content": sanitized_answer,
                 "avatar_icon": "🤖",
-                "context": retrieved_context,
-                "response_time": round(end_time - start_time, 2)
+                "context": compact_context(retrieved_context),
+                "response_time": round(end_time - start_time, 2),
+                "prompt_tokens": context_stats.get("prompt_tokens")
             })
 
         except Exception as e:
             error_message = f"An error occurred: {e}"
             sanitized_error_message = sanitize_html(error_message)
-            st.session_state.messages.append({
+            append_message(st.session_state.messages, {
                 "role": "assistant",
                 "content": sanitized_error_message,
                 "avatar_icon": "🤖",
@@ -418,7 +475,7 @@ if user_question:
             thinking_placeholder_container.empty()
             st.rerun()
     else:
-        st.session_state.messages.append({
+        append_message(st.session_state.messages, {
             "role": "assistant",
             "content": "I'm currently unable to connect to the movie database. Please check settings.",
             "avatar_icon": "🤖"
@@ -0,0 +1,130 @@
+# rag_pipeline/chat_store.py
+
+import sys
+import os
+
+# Messages kept per session; older ones are dropped
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "200"))
+
+# Messages rendered per page; older pages load on demand
+CHAT_RENDER_WINDOW = int(os.getenv("CHAT_RENDER_WINDOW", "20"))
+
+
+def compact_context(docs):
+    """
+    Reduces retrieved Documents to the references needed to show them later.
+
+    Args:
+        docs (list): Packed Documents returned by the RAG chain.
+
+    Returns:
+        list: One {"chunk_ids", "score"} dict per document, plus "max_chars" when
+        the packer trimmed the text to fit the budget. Documents without chunk ids
+        (indexes built before ids were assigned) keep their text instead.
+    """
+    refs = []
+    for doc in docs:
+        metadata = doc.metadata or {}
+        ref = {"score": round(float(metadata.get("score", 0.0)), 4)}
+        if metadata.get("chunk_ids"):
+            ref["chunk_ids"] = tuple(metadata["chunk_ids"])
+            if metadata.get("trimmed_chars"):
+                ref["max_chars"] = metadata["trimmed_chars"]
+        else:
+            ref["text"] = doc.page_content
+        refs.append(ref)
+    return refs
+
+
+def append_message(messages, message, max_messages=CHAT_HISTORY_MAX_MESSAGES):
+    """
+    Appends a message with a stable id and trims the history to `max_messages`.
+
+    Args:
+        messages (list): Session message list, modified in place.
+        message (dict): Message to add.
+        max_messages (int): Cap on stored messages.
+
+    Returns:
+        dict: The stored message.
+    """
+    message["id"] = messages[-1].get("id", len(messages)) + 1 if messages else 0
+    messages.append(message)
+    if len(messages) > max_messages:
+        del messages[:len(messages) - max_messages]
+    return message
+
+
+def visible_messages(messages, window):
+    """
+    Returns the newest `window` messages and how many older ones are hidden.
+    """
+    hidden = max(0, len(messages) - window)
+    return messages[hidden:], hidden
+
+
+def fetch_chunk_texts(index, chunk_ids):
+    """
+    Fetches chunk text from Pinecone by vector id.
+
+    Args:
+        index: Pinecone Index object.
+        chunk_ids (tuple): Vector ids to fetch.
+
+    Returns:
+        dict: chunk id -> text (ids no longer in the index are omitted).
+    """
+    response = index.fetch(ids=list(chunk_ids))
+    vectors = response["vectors"] if isinstance(response, dict) else response.vectors
+    texts = {}
+    for chunk_id, vector in vectors.items():
+        metadata = vector["metadata"] if isinstance(vector, dict) else vector.metadata
+        if metadata and metadata.get("text"):
+            texts[chunk_id] = metadata["text"]
+    return texts
+
+
+def resolve_context_text(ref, fetch):
+    """
+    Rebuilds the displayed text for one context reference.
+
+    Args:
+        ref (dict): Entry produced by compact_context.
+        fetch (callable): chunk_ids tuple -> {chunk id: text}.
+
+    Returns:
+        str: Text to show (cut to the length the LLM saw), or a note if the chunks
+        are gone from the index or cannot be fetched right now.
+    """
+    if "text" in ref:
+        return ref["text"]
+    from rag_pipeline.context_packer import merge_chunks
+
+    try:
+        texts = fetch(ref["chunk_ids"])
+    except Exception as e:
+        print(f"Could not fetch context chunks {ref['chunk_ids']}: {e}")
+        return "(Context is unavailable right now. Please try again later.)"
+    found = [texts[chunk_id] for chunk_id in ref["chunk_ids"] if chunk_id in texts]
+    if not found:
+        return "(This context is no longer available in the index.)"
+    text = merge_chunks(found)
+    if ref.get("max_chars") and len(text) > ref["max_chars"]:
+        text = text[:ref["max_chars"]] + "\n[... trimmed here to fit the context budget ...]"
+    return text
+
+
+def estimate_size_bytes(obj, _seen=None):
+    """
+    Approximate deep size of session state objects (dicts, lists, tuples, strings).
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size_bytes(k, seen) + estimate_size_bytes(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(estimate_size_bytes(item, seen) for item in obj)
+    return size
@@ -0,0 +1,186 @@
+# rag_pipeline/context_packer.py
+
+from langchain_core.documents import Document
+import math
+import os
+
+# Approximate prompt tokens allowed for the retrieved context
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+
+# Shortest suffix/prefix overlap treated as the splitter's chunk_overlap
+MIN_MERGE_OVERLAP = 20
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token for English text).
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Approximate token count.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def normalize_text(text):
+    """
+    Collapses whitespace and case so re-uploaded copies of a chunk compare equal.
+    """
+    return " ".join(text.split()).lower()
+
+
+def merge_overlapping(first, second, min_overlap=MIN_MERGE_OVERLAP):
+    """
+    Joins two chunks if one contains the other or the end of `first` overlaps
+    the start of `second` (as produced by RecursiveCharacterTextSplitter's chunk_overlap).
+
+    Args:
+        first (str): Earlier chunk.
+        second (str): Later chunk.
+        min_overlap (int): Shortest overlap accepted as a real continuation.
+
+    Returns:
+        str: Merged text, or None if the chunks do not overlap.
+    """
+    if second in first:
+        return first
+    if first in second:
+        return second
+
+    head = second[:min_overlap]
+    start = first.find(head)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first[:start] + second
+        start = first.find(head, start + 1)
+    return None
+
+
+def _merge_into(pieces, text):
+    """
+    Merges `text` with every piece it overlaps, or appends it.
+
+    A chunk that arrives after both of its neighbours (e.g. chunks 0 and 2 ranked
+    above chunk 1) bridges them, so the grown text is re-checked against the
+    remaining pieces until nothing else overlaps.
+
+    Returns:
+        bool: True if the text was merged into an existing piece.
+    """
+    position = None
+    i = 0
+    while i < len(pieces):
+        merged = merge_overlapping(pieces[i], text) or merge_overlapping(text, pieces[i])
+        if merged is None:
+            i += 1
+            continue
+        text = merged
+        del pieces[i]
+        position = i if position is None else min(position, i)
+        i = 0
+    if position is None:
+        pieces.append(text)
+        return False
+    pieces.insert(position, text)
+    return True
+
+
+def merge_chunks(texts):
+    """
+    Stitches chunks back together on their overlaps.
+
+    Args:
+        texts (list): Chunk texts, best first.
+
+    Returns:
+        str: Merged text, non-overlapping pieces separated by newlines.
+    """
+    pieces = []
+    for text in texts:
+        _merge_into(pieces, text.strip())
+    return "\n".join(pieces)
+
+
+def pack_context(scored_docs, token_budget=CONTEXT_TOKEN_BUDGET, ranked=False):
+    """
+    Turns raw retriever hits into a compact, deduplicated context.
+
+    Exact and overlapping duplicates are dropped, chunks of the same source row
+    (e.g. one movie split into several chunks) are stitched back together, and the
+    result is filled greedily by score until the token budget is used up.
+
+    Args:
+        scored_docs (list): (Document, score) pairs, higher score = more relevant.
+        token_budget (int): Approximate token budget for all packed context.
+        ranked (bool): scored_docs are already in priority order (e.g. fused
+            multi-query results) and should be packed in that order, not by score.
+
+    Returns:
+        tuple: (list of packed Documents, dict of packing stats).
+    """
+    ranked = list(scored_docs) if ranked else sorted(scored_docs, key=lambda pair: pair[1], reverse=True)
+
+    groups = {}
+    seen = set()
+    duplicates = 0
+    merged = 0
+    for i, (doc, score) in enumerate(ranked):
+        key = normalize_text(doc.page_content)
+        if not key or key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+
+        metadata = doc.metadata or {}
+        row_id = metadata.get("row_id")
+        group_key = (metadata.get("source"), row_id) if row_id else i
+        group = groups.setdefault(
+            group_key, {"pieces": [], "chunk_ids": [], "score": score, "metadata": dict(metadata)}
+        )
+        chunk_id = metadata.get("chunk_id") or getattr(doc, "id", None)
+        if chunk_id:
+            group["chunk_ids"].append(chunk_id)
+        if _merge_into(group["pieces"], doc.page_content.strip()):
+            merged += 1
+
+    # Chunks without a source row can still be verbatim copies of text kept elsewhere
+    kept_groups = list(groups.values())
+    for group in kept_groups:
+        if len(group["pieces"]) == 1 and not group["metadata"].get("row_id"):
+            text = normalize_text(group["pieces"][0])
+            if any(text in normalize_text("\n".join(other["pieces"]))
+                   for other in kept_groups if other is not group and other["pieces"]):
+                group["pieces"] = []
+                duplicates += 1
+
+    packed = []
+    used_tokens = 0
+    for group in kept_groups:
+        if not group["pieces"]:
+            continue
+        text = "\n".join(group["pieces"])
+        tokens = estimate_tokens(text)
+        metadata = dict(group["metadata"], score=group["score"], chunk_ids=group["chunk_ids"])
+        if used_tokens + tokens > token_budget:
+            if packed:
+                continue
+            # Always keep the best hit, trimmed to the budget
+            text = text[:token_budget * CHARS_PER_TOKEN]
+            tokens = estimate_tokens(text)
+            metadata["trimmed_chars"] = len(text)
+        packed.append(Document(page_content=text, metadata=metadata))
+        used_tokens += tokens
+
+    stats = {
+        "candidates": len(scored_docs),
+        "duplicates_removed": duplicates,
+        "chunks_merged": merged,
+        "packed_docs": len(packed),
+        "context_tokens_before": sum(estimate_tokens(doc.page_content) for doc, _ in scored_docs),
+        "context_tokens_after": used_tokens,
+    }
+    return packed, stats
@@ -0,0 +1,81 @@
+# rag_pipeline/index_manifest.py
+
+import uuid
+import json
+import time
+import os
+
+# Written by every embedding build that changes the Pinecone index; anything
+# derived from the index (e.g. the answer cache) records the build id it saw.
+INDEX_BUILD_MANIFEST = os.getenv("INDEX_BUILD_MANIFEST", "index_build.json")
+
+# The build id is also stored in the live index as a sentinel vector, in its own
+# namespace so it never shows up in similarity searches of the default one.
+BUILD_SENTINEL_NAMESPACE = "index-meta"
+BUILD_SENTINEL_ID = "index-build"
+
+
+def write_index_manifest(path=INDEX_BUILD_MANIFEST, index=None, dimension=None, **info):
+    """
+    Records a new index build in the manifest file and, given the Pinecone index,
+    in the index itself.
+
+    Args:
+        path (str): Manifest file to write.
+        index: Pinecone Index object that was just built (optional).
+        dimension (int): Vector dimension of the index (required with `index`).
+        **info: Extra fields to store (index name, vector counts, ...).
+
+    Returns:
+        str: The new build id.
+    """
+    build_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    manifest = dict(info, build_id=build_id, built_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    if index is not None and dimension:
+        # Pinecone rejects all-zero vectors, so the sentinel is a unit vector
+        sentinel = [1.0] + [0.0] * (dimension - 1)
+        index.upsert(vectors=[(BUILD_SENTINEL_ID, sentinel, {"build_id": build_id, "built_at": manifest["built_at"]})],
+                     namespace=BUILD_SENTINEL_NAMESPACE)
+    print(f"Index build {build_id} recorded in {path}" + (" and in the index." if index is not None else "."))
+    return build_id
+
+
+def read_index_build_id(path=INDEX_BUILD_MANIFEST):
+    """
+    Returns the build id from the manifest file, or None if no manifest exists.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f).get("build_id")
+    except (OSError, ValueError):
+        return None
+
+
+def read_live_build_id(index):
+    """
+    Returns the build id stored in the Pinecone index, or None if it has none.
+
+    Args:
+        index: Pinecone Index object.
+    """
+    response = index.fetch(ids=[BUILD_SENTINEL_ID], namespace=BUILD_SENTINEL_NAMESPACE)
+    vectors = response["vectors"] if isinstance(response, dict) else response.vectors
+    vector = vectors.get(BUILD_SENTINEL_ID)
+    if vector is None:
+        return None
+    metadata = vector["metadata"] if isinstance(vector, dict) else vector.metadata
+    return (metadata or {}).get("build_id")
+
+
+def current_build_id(index=None, path=INDEX_BUILD_MANIFEST):
+    """
+    Build id of the index as it is now: the live index's sentinel when available,
+    otherwise the manifest file (indexes built before the sentinel existed).
+    """
+    if index is not None:
+        build_id = read_live_build_id(index)
+        if build_id:
+            return build_id
+    return read_index_build_id(path)
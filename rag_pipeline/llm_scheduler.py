@@ -0,0 +1,141 @@
+# rag_pipeline/llm_scheduler.py
+
+from concurrent.futures import Future
+import threading
+import time
+import os
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "10"))
+
+BUSY_ANSWER = ("I'm handling a lot of movie questions right now. 🎬 "
+               "Please try again in a few seconds.")
+
+
+class SchedulerBusy(Exception):
+    """
+    Raised when a request is shed because the queue is full or its deadline passed.
+    """
+
+
+class LLMScheduler:
+    """
+    Gatekeeper for LLM calls shared by all sessions.
+
+    - At most `max_concurrency` generations run at once.
+    - Requests with the same key while one is in flight wait for the leader's
+      result instead of starting another generation.
+    - At most `max_queue` distinct requests wait for a slot; beyond that, or after
+      waiting `queue_timeout_s`, the request is shed with SchedulerBusy.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, max_queue=LLM_MAX_QUEUE,
+                 queue_timeout_s=LLM_QUEUE_TIMEOUT_S):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._queued = 0
+        self._running = 0
+        self._metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "coalesced": 0,
+            "shed_queue_full": 0,
+            "shed_deadline": 0,
+            "max_queue_depth": 0,
+            "wait_time_total_s": 0.0,
+            "wait_time_max_s": 0.0,
+        }
+
+    def run(self, key, fn):
+        """
+        Runs `fn()` under the scheduler, or joins an identical in-flight call.
+
+        Args:
+            key (str): Identity of the request (e.g. the fully rendered prompt).
+            fn (callable): Zero-argument function performing the LLM call.
+
+        Returns:
+            The result of fn(), possibly produced by another caller.
+
+        Raises:
+            SchedulerBusy: If the request was shed.
+        """
+        with self._lock:
+            self._metrics["submitted"] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self._metrics["coalesced"] += 1
+                is_leader = False
+            elif self._queued >= self.max_queue:
+                self._metrics["shed_queue_full"] += 1
+                raise SchedulerBusy("LLM queue is full")
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self._queued += 1
+                self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], self._queued)
+                is_leader = True
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            start = time.monotonic()
+            acquired = self._slots.acquire(timeout=self.queue_timeout_s)
+            waited = time.monotonic() - start
+            with self._lock:
+                self._queued -= 1
+                self._metrics["wait_time_total_s"] += waited
+                self._metrics["wait_time_max_s"] = max(self._metrics["wait_time_max_s"], waited)
+                if acquired:
+                    self._running += 1
+                else:
+                    self._metrics["shed_deadline"] += 1
+            if not acquired:
+                raise SchedulerBusy(f"No LLM slot free within {self.queue_timeout_s}s")
+
+            try:
+                result = fn()
+            finally:
+                self._slots.release()
+                with self._lock:
+                    self._running -= 1
+        except BaseException as e:
+            with self._lock:
+                if not isinstance(e, SchedulerBusy):
+                    self._metrics["failed"] += 1
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._metrics["completed"] += 1
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def metrics(self):
+        """
+        Returns current queue depth, in-flight counts and cumulative counters.
+
+        Returns:
+            dict: Scheduler metrics.
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            waits = metrics["completed"] + metrics["failed"] + metrics["shed_deadline"]
+            metrics.update({
+                "queue_depth": self._queued,
+                "running": self._running,
+                "in_flight_keys": len(self._inflight),
+                "wait_time_avg_s": round(metrics["wait_time_total_s"] / waits, 4) if waits else 0.0,
+                "wait_time_total_s": round(metrics["wait_time_total_s"], 4),
+                "wait_time_max_s": round(metrics["wait_time_max_s"], 4),
+            })
+            return metrics
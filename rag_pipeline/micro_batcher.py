@@ -0,0 +1,97 @@
+# rag_pipeline/micro_batcher.py
+
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+import threading
+import queue
+import time
+import os
+
+EMBEDDING_MICRO_BATCHING = os.getenv("EMBEDDING_MICRO_BATCHING", "true").lower() in ("1", "true", "yes")
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Thread-safe wrapper that coalesces concurrent embed_query calls into one batch.
+
+    The first query to arrive opens a window of `window_ms`; every query that
+    arrives before it closes (up to `max_batch_size`) is embedded in the same
+    forward pass, and each caller gets back only its own vector.
+    """
+
+    def __init__(self, embeddings, window_ms=EMBEDDING_BATCH_WINDOW_MS, max_batch_size=EMBEDDING_MAX_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._queries = 0
+        self._largest_batch = 0
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                vectors = list(self.embeddings.embed_documents([text for text, _ in batch]))
+                if len(vectors) != len(batch):
+                    # zip() would silently leave the extra callers waiting forever
+                    raise RuntimeError(f"Embedding model returned {len(vectors)} vectors for {len(batch)} queries")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            with self._stats_lock:
+                self._batches += 1
+                self._queries += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+
+    def embed_query(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        self._ensure_worker()
+        return future.result()
+
+    def embed_documents(self, texts):
+        # Callers passing lists already batch their own work
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self):
+        """
+        Returns how well queries are being coalesced.
+
+        Returns:
+            dict: Batches run, queries served, average and largest batch size.
+        """
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "queries": self._queries,
+                "avg_batch_size": round(self._queries / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+            }
@@ -0,0 +1,165 @@
+# rag_pipeline/model_loader.py
+
+from contextlib import contextmanager
+import argparse
+import time
+import os
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Pre-packaged copy of the embedding model (baked into the Docker image by
+# `python -m rag_pipeline.model_loader`). Falls back to the Hugging Face hub if missing.
+EMBEDDING_MODEL_DIR = os.getenv(
+    "EMBEDDING_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "all-MiniLM-L6-v2")
+)
+
+# "torch" (HuggingFaceEmbeddings) or "onnx" (ONNX Runtime export of the same model)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_QUANTIZED = os.getenv("EMBEDDING_ONNX_QUANTIZED", "false").lower() in ("1", "true", "yes")
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0")) or None
+
+# Lowest acceptable cosine similarity to the PyTorch model when exporting
+MIN_COSINE_FP32 = 0.99
+MIN_COSINE_INT8 = 0.98
+
+# Label -> seconds, filled in as the app imports and loads things
+STARTUP_TIMINGS = {}
+
+
+@contextmanager
+def timed(label):
+    """
+    Records how long the wrapped block took in STARTUP_TIMINGS. Only the first
+    run of each label is kept, since Streamlit reruns hit already-imported modules.
+
+    Args:
+        label (str): Name shown in the startup report.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS.setdefault(label, round(time.perf_counter() - start, 3))
+
+
+def format_timings():
+    """
+    Returns the startup timings as a single human readable line.
+    """
+    return ", ".join(f"{label}: {seconds}s" for label, seconds in STARTUP_TIMINGS.items())
+
+
+def resolve_embedding_model():
+    """
+    Picks the local model artifact if it has been packaged, otherwise the hub model name.
+
+    Returns:
+        str: Local directory or Hugging Face model id to load.
+    """
+    if os.path.isfile(os.path.join(EMBEDDING_MODEL_DIR, "modules.json")):
+        return EMBEDDING_MODEL_DIR
+    return EMBEDDING_MODEL_NAME
+
+
+def create_embeddings(backend=None, quantized=None, num_threads=None):
+    """
+    Builds the embedding model for the requested backend.
+
+    Args:
+        backend (str): "torch" or "onnx". Defaults to EMBEDDING_BACKEND.
+        quantized (bool): Use the int8 ONNX model. Defaults to EMBEDDING_ONNX_QUANTIZED.
+        num_threads (int): ONNX Runtime intra-op threads. Defaults to EMBEDDING_NUM_THREADS.
+
+    Returns:
+        Embeddings: LangChain-compatible embedding model.
+    """
+    backend = backend or EMBEDDING_BACKEND
+    quantized = EMBEDDING_ONNX_QUANTIZED if quantized is None else quantized
+    num_threads = num_threads or EMBEDDING_NUM_THREADS
+
+    if backend == "onnx":
+        with timed("import onnxruntime"):
+            from rag_pipeline.onnx_embeddings import OnnxEmbeddings
+        with timed("load embedding model"):
+            return OnnxEmbeddings(EMBEDDING_MODEL_DIR, quantized=quantized, num_threads=num_threads)
+    if backend != "torch":
+        raise ValueError(f"Unknown embedding backend '{backend}', expected 'torch' or 'onnx'.")
+
+    with timed("import langchain_huggingface"):
+        from langchain_huggingface import HuggingFaceEmbeddings
+    with timed("load embedding model"):
+        return HuggingFaceEmbeddings(model_name=resolve_embedding_model())
+
+
+def load_embeddings(backend=None):
+    """
+    Loads the configured embedding backend and warms it up with one query,
+    recording import and load time separately.
+
+    Args:
+        backend (str): "torch" or "onnx". Defaults to EMBEDDING_BACKEND.
+
+    Returns:
+        Embeddings: Ready to use embedding model.
+    """
+    embeddings = create_embeddings(backend)
+    with timed("embedding warm-up"):
+        embeddings.embed_query("warm-up")
+    print(f"Loaded {backend or EMBEDDING_BACKEND} embedding model from {resolve_embedding_model()}")
+    return embeddings
+
+
+def export_model(output_dir=EMBEDDING_MODEL_DIR):
+    """
+    Downloads the embedding model once and saves it as a local artifact.
+
+    Args:
+        output_dir (str): Directory to write the model to.
+
+    Returns:
+        str: The output directory.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    print(f"Exporting {EMBEDDING_MODEL_NAME} to {output_dir}...")
+    SentenceTransformer(EMBEDDING_MODEL_NAME).save(output_dir)
+    print("Model exported successfully.")
+    return output_dir
+
+
+def export_and_validate_onnx(model_dir=EMBEDDING_MODEL_DIR, quantize=False):
+    """
+    Exports the packaged model to ONNX and checks every exported variant
+    against the PyTorch model before it can be served.
+
+    Args:
+        model_dir (str): Directory written by export_model.
+        quantize (bool): Also export and validate the int8 model.
+
+    Returns:
+        None
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from rag_pipeline.onnx_embeddings import OnnxEmbeddings, export_onnx, validate_against_reference
+
+    export_onnx(model_dir, quantize=quantize)
+
+    reference = HuggingFaceEmbeddings(model_name=model_dir)
+    for quantized in ([False, True] if quantize else [False]):
+        min_cosine = MIN_COSINE_INT8 if quantized else MIN_COSINE_FP32
+        report = validate_against_reference(
+            OnnxEmbeddings(model_dir, quantized=quantized), reference, min_cosine=min_cosine
+        )
+        print(f"{'int8' if quantized else 'fp32'} ONNX model agrees with the reference: {report}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Package the embedding model for offline startup.")
+    parser.add_argument("--output", default=EMBEDDING_MODEL_DIR, help="Directory to write the model to.")
+    parser.add_argument("--onnx", action="store_true", help="Also export an ONNX Runtime model.")
+    parser.add_argument("--quantize", action="store_true", help="Also export a dynamic int8 ONNX model.")
+    args = parser.parse_args()
+    export_model(args.output)
+    if args.onnx or args.quantize:
+        export_and_validate_onnx(args.output, quantize=args.quantize)
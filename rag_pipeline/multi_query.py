@@ -0,0 +1,243 @@
+# rag_pipeline/multi_query.py
+
+from concurrent.futures import ThreadPoolExecutor
+from rag_pipeline.context_packer import normalize_text
+import threading
+import re
+import os
+
+MULTI_QUERY_ENABLED = os.getenv("MULTI_QUERY_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+MULTI_QUERY_MAX_SUBQUERIES = int(os.getenv("MULTI_QUERY_MAX_SUBQUERIES", "4"))
+
+# Threads shared by all sessions for concurrent vector searches
+MULTI_QUERY_MAX_WORKERS = int(os.getenv("MULTI_QUERY_MAX_WORKERS", "8"))
+
+# Reciprocal rank fusion constant (score = sum of 1 / (RRF_K + rank))
+RRF_K = 60
+
+# Separators between the items of "A and B", "A, B and C", "A vs B", "A or B"
+_ITEM_SEPARATOR = re.compile(r"\s*,\s*(?:and\s+|or\s+)?|\s+(?:and|or|vs\.?|versus)\s+", re.IGNORECASE)
+
+# Separators that always mean separate items; "and" may be part of a title
+# ("Romeo and Juliet") or a pair of names ("Tom Hanks and Meg Ryan")
+_CHOICE_SEPARATOR = re.compile(r"\s*,\s*(?:or\s+)?|\s+(?:or|vs\.?|versus)\s+", re.IGNORECASE)
+_CHOICE_WORD = re.compile(r"\s(?:or|vs\.?|versus)\s", re.IGNORECASE)
+
+# Words asking about each item on its own, which lets a plain "A and B" be split
+_COMPARISON_HINT = re.compile(
+    r"\b(?:compare|contrast|differ|differs|difference|differences|both|each|respectively)\b", re.IGNORECASE
+)
+
+# Quoted titles ("Romeo and Juliet", 'Me, Myself & Irene') are never split
+_QUOTED = re.compile(r"\"[^\"]+\"|\u201c[^\u201d]+\u201d|(?<!\w)'[^']+'(?!\w)")
+_PLACEHOLDER = "\ue000{}\ue001"
+
+# Lead-ins that only say "compare these"; dropped from the sub-queries
+_COMPARE_LEAD_IN = re.compile(
+    r"^(?:(?:please\s+)?(?:compare|contrast)(?:\s+the)?"
+    r"|(?:what(?:'s|\s+is|\s+are)\s+)?the\s+differences?\s+between"
+    r"|how\s+do)(?:\s+|$)",
+    re.IGNORECASE
+)
+
+# Lowercase words allowed inside a title ("The Lord of the Rings", "Romeo and Juliet")
+_TITLE_CONNECTORS = {"of", "the", "a", "an", "in", "on", "at", "to", "for", "and", "&", "-", ":"}
+
+# Sentence openers that are capitalized but never start a title
+_QUESTION_OPENERS = {
+    "who", "what", "which", "when", "where", "why", "how", "is", "are", "was", "were",
+    "did", "does", "do", "can", "compare", "contrast", "tell", "list", "show", "give", "recommend",
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _is_title_word(word):
+    return word[:1].isupper() or word[:1].isdigit() or word[:1] == _PLACEHOLDER[0]
+
+
+def _split_items(text):
+    """
+    Splits a (quote-masked) question into its items.
+
+    "A or B", "A vs B" and comma lists always split. A plain "A and B" only
+    splits when the question asks about each item ("compare", "difference",
+    "both", ...), since capitalized pairs are as often one title or a pair of
+    names ("Who directed Romeo and Juliet?", "Movies with Tom Hanks and Meg Ryan").
+    """
+    if _CHOICE_WORD.search(text):
+        return _CHOICE_SEPARATOR.split(text)
+    if "," in text or _COMPARISON_HINT.search(text):
+        return _ITEM_SEPARATOR.split(text)
+    return [text]
+
+
+def _trailing_title(words):
+    """
+    Index where the trailing run of title words starts (len(words) if there is none).
+    """
+    start = len(words)
+    i = len(words) - 1
+    while i >= 0:
+        if i == 0 and words[0].lower() in _QUESTION_OPENERS:
+            break
+        if _is_title_word(words[i]):
+            start = i
+        elif words[i].lower() not in _TITLE_CONNECTORS:
+            break
+        i -= 1
+    return start
+
+
+def _leading_title(words):
+    """
+    Index where the leading run of title words ends (0 if there is none).
+    """
+    end = 0
+    for i, word in enumerate(words):
+        if _is_title_word(word):
+            end = i + 1
+        elif word.lower() not in _TITLE_CONNECTORS:
+            break
+    return end
+
+
+def split_question(question, max_subqueries=MULTI_QUERY_MAX_SUBQUERIES):
+    """
+    Rule-based decomposition of a compound question into one sub-query per entity.
+
+    "Compare the directors of The Matrix and Inception" becomes
+    ["directors of The Matrix", "directors of Inception"]. Items after the first
+    must start like a title (capitalized word, number or quoted span), so lowercase
+    phrases such as "action and drama movies" are left alone. Quoted spans are kept
+    whole, and "and" only splits questions that ask about each item (see _split_items).
+
+    Args:
+        question (str): User question.
+        max_subqueries (int): Cap on returned sub-queries.
+
+    Returns:
+        list: Sub-queries, or [question] if it does not look compound.
+    """
+    quoted = []
+
+    def mask(match):
+        quoted.append(match.group(0))
+        return _PLACEHOLDER.format(len(quoted) - 1)
+
+    text = _QUOTED.sub(mask, question.strip().rstrip("?.! "))
+    items = [item for item in _split_items(text) if item]
+    if len(items) < 2 or not all(_is_title_word(item) for item in items[1:]):
+        return [question]
+
+    # "Who directed The Matrix" -> stem "Who directed", entity "The Matrix"
+    first_words = items[0].split()
+    stem_end = _trailing_title(first_words)
+    stem = _COMPARE_LEAD_IN.sub("", " ".join(first_words[:stem_end]))
+    entities = [" ".join(first_words[stem_end:])] if stem_end < len(first_words) else []
+
+    # "... and Inception both rated R" -> entity "Inception", suffix "both rated R"
+    last_words = items[-1].split()
+    title_end = _leading_title(last_words)
+    suffix = " ".join(last_words[title_end:])
+    entities += items[1:-1] + [" ".join(last_words[:title_end])]
+
+    sub_queries = []
+    for entity in entities:
+        sub_query = " ".join(part for part in (stem, entity, suffix) if part)
+        for n, span in enumerate(quoted):
+            sub_query = sub_query.replace(_PLACEHOLDER.format(n), span)
+        if entity and sub_query not in sub_queries:
+            sub_queries.append(sub_query)
+    if len(sub_queries) < 2:
+        return [question]
+    return sub_queries[:max_subqueries]
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MULTI_QUERY_MAX_WORKERS,
+                                           thread_name_prefix="multi-query")
+        return _executor
+
+
+def _doc_key(doc):
+    metadata = doc.metadata or {}
+    return metadata.get("chunk_id") or getattr(doc, "id", None) or normalize_text(doc.page_content)
+
+
+def fuse_results(result_lists, k, reserved_lists=None):
+    """
+    Merges ranked (Document, score) lists with reciprocal rank fusion.
+
+    The best hit of every list in `reserved_lists` is placed first, so a query
+    whose results score lower than the others is not crowded out; the remaining
+    slots are filled by fused rank. Duplicates across lists are collapsed and keep
+    their highest similarity score.
+
+    Args:
+        result_lists (list): One ranked list of (Document, score) per query.
+        k (int): Total hits to return.
+        reserved_lists (list): Indexes into result_lists that get a guaranteed slot.
+
+    Returns:
+        list: Up to k (Document, score) pairs, most important first.
+    """
+    fused = {}
+    for hits in result_lists:
+        for rank, (doc, score) in enumerate(hits, start=1):
+            key = _doc_key(doc)
+            entry = fused.setdefault(key, {"doc": doc, "score": score, "rrf": 0.0})
+            entry["score"] = max(entry["score"], score)
+            entry["rrf"] += 1.0 / (RRF_K + rank)
+
+    selected = []
+    for i in reserved_lists or ():
+        for doc, _ in result_lists[i]:
+            key = _doc_key(doc)
+            if key not in selected:
+                selected.append(key)
+                break
+    by_rank = sorted(fused, key=lambda key: (fused[key]["rrf"], fused[key]["score"]), reverse=True)
+    for key in by_rank:
+        if key not in selected:
+            selected.append(key)
+
+    return [(fused[key]["doc"], fused[key]["score"]) for key in selected[:k]]
+
+
+def multi_query_search(vectorstore, question, k, max_subqueries=MULTI_QUERY_MAX_SUBQUERIES):
+    """
+    Retrieves for each entity of a compound question in parallel and fuses the hits.
+
+    The original question and its sub-queries are embedded in one batch, searched
+    concurrently, and fused to at most k hits, with the best hit of each search
+    (the original question's first) guaranteed a slot. Simple questions fall
+    through to a single similarity search.
+
+    Args:
+        vectorstore: Vector store with `embeddings` and similarity_search_by_vector_with_score.
+        question (str): User question.
+        k (int): Total hits to return across all sub-queries.
+        max_subqueries (int): Cap on sub-queries.
+
+    Returns:
+        tuple: (list of (Document, score) pairs in priority order, list of sub-queries).
+    """
+    sub_queries = split_question(question, max_subqueries)
+    if len(sub_queries) == 1:
+        return vectorstore.similarity_search_with_score(question, k=k), sub_queries
+
+    # The full question is searched too and its best hit keeps a slot, which limits
+    # the damage of a wrong split; the sub-queries still take slots from its other hits
+    queries = [question] + sub_queries
+    vectors = vectorstore.embeddings.embed_documents(queries)
+    futures = [
+        _get_executor().submit(vectorstore.similarity_search_by_vector_with_score, vector, k=k)
+        for vector in vectors
+    ]
+    result_lists = [future.result() for future in futures]
+    return fuse_results(result_lists, k, reserved_lists=range(len(queries))), sub_queries
@@ -0,0 +1,164 @@
+# rag_pipeline/onnx_embeddings.py
+
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import os
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+# Texts used to check that an exported model agrees with the PyTorch reference
+VALIDATION_TEXTS = [
+    "What is the plot of The Matrix?",
+    "Who directed Inception?",
+    "'The Godfather' is a Crime,Drama movie released on 1972-03-24 00:00:00.",
+    "On 2012-03-26, Mercedes Tyler commented on movie ID 573a1390f29313caabcd4323.",
+    "Theater located in Bloomington, MN.",
+    "This is the user profile of Ned Stark with the email address sean_bean@gameofthron.es.",
+]
+
+
+def onnx_model_path(model_dir, quantized=False):
+    """
+    Returns where the exported ONNX model lives inside a packaged model directory.
+    """
+    return os.path.join(model_dir, "onnx", ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an ONNX Runtime export of all-MiniLM-L6-v2.
+
+    Reproduces the sentence-transformers pipeline (tokenize, transformer,
+    mean pooling, L2 normalize) without importing torch.
+    """
+
+    def __init__(self, model_dir, quantized=False, num_threads=None, batch_size=32, max_length=256):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            onnx_model_path(model_dir, quantized), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[i:i + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
+
+
+def export_onnx(model_dir, quantize=False):
+    """
+    Exports the packaged transformer to ONNX, optionally adding a dynamic int8 copy.
+
+    Args:
+        model_dir (str): Directory written by model_loader.export_model.
+        quantize (bool): Also write a dynamically int8-quantized model.
+
+    Returns:
+        list: Paths of the written ONNX models.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_path = onnx_model_path(model_dir)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    model = AutoModel.from_pretrained(model_dir).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    sample = tokenizer(VALIDATION_TEXTS[:2], padding=True, return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    print(f"Exporting ONNX model to {output_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            output_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    written = [output_path]
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantized_path = onnx_model_path(model_dir, quantized=True)
+        print(f"Quantizing to int8 at {quantized_path}...")
+        quantize_dynamic(output_path, quantized_path, weight_type=QuantType.QInt8)
+        written.append(quantized_path)
+
+    return written
+
+
+def cosine_agreement(candidate, reference, texts=VALIDATION_TEXTS):
+    """
+    Compares two embedding backends on the same texts.
+
+    Args:
+        candidate (Embeddings): Backend under test.
+        reference (Embeddings): Reference backend (PyTorch sentence-transformers).
+        texts (list): Texts to embed with both.
+
+    Returns:
+        dict: Minimum and mean cosine similarity between paired vectors.
+    """
+    a = np.array(candidate.embed_documents(texts))
+    b = np.array(reference.embed_documents(texts))
+    cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean())}
+
+
+def validate_against_reference(candidate, reference, min_cosine=0.99, texts=VALIDATION_TEXTS):
+    """
+    Raises if the candidate backend drifts from the reference model.
+
+    Args:
+        candidate (Embeddings): Backend under test.
+        reference (Embeddings): Reference backend.
+        min_cosine (float): Lowest acceptable cosine similarity for any text.
+        texts (list): Texts to compare on.
+
+    Returns:
+        dict: The agreement report from cosine_agreement.
+    """
+    report = cosine_agreement(candidate, reference, texts)
+    if report["min_cosine"] < min_cosine:
+        raise ValueError(
+            f"Embedding backend disagrees with the reference model: "
+            f"min cosine {report['min_cosine']:.4f} < {min_cosine}"
+        )
+    return report
@@ -0,0 +1,76 @@
+# rag_pipeline/rag_chain.py
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+from rag_pipeline.context_packer import pack_context, estimate_tokens, CONTEXT_TOKEN_BUDGET
+from rag_pipeline.llm_scheduler import SchedulerBusy, BUSY_ANSWER
+from rag_pipeline.multi_query import multi_query_search, MULTI_QUERY_ENABLED
+import os
+
+# Hits fetched from the vector store before dedup/packing trims them down
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "6"))
+
+
+def format_docs(docs):
+    """
+    Renders documents the way create_stuff_documents_chain did ("\n\n"-joined page content).
+    """
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def build_rag_chain(llm, vectorstore, prompt, candidates=RETRIEVAL_CANDIDATES,
+                    token_budget=CONTEXT_TOKEN_BUDGET, scheduler=None, multi_query=MULTI_QUERY_ENABLED):
+    """
+    Builds retrieve -> pack -> generate as a single runnable.
+
+    Args:
+        llm: Chat model used for generation.
+        vectorstore: Vector store supporting similarity_search_with_score (and
+            similarity_search_by_vector_with_score for multi-query retrieval).
+        prompt (ChatPromptTemplate): Prompt with {context} and {input} variables.
+        candidates (int): Number of hits to retrieve before packing.
+        token_budget (int): Approximate token budget for the packed context.
+        scheduler (LLMScheduler): Optional shared scheduler that caps, coalesces and
+            sheds LLM calls. Shed requests get BUSY_ANSWER.
+        multi_query (bool): Split compound questions ("A and B") into per-entity
+            sub-queries, search them in parallel and fuse the hits.
+
+    Returns:
+        Runnable: Takes {"input": question} and returns {"input", "context", "answer", "context_stats"}.
+        context_stats["prompt_tokens"] is the input token count reported by the LLM
+        (None when shed or unreported); "prompt_tokens_estimate" is the len/4 estimate.
+    """
+    parser = StrOutputParser()
+
+    def answer_question(inputs):
+        question = inputs["input"]
+        if multi_query:
+            scored_docs, sub_queries = multi_query_search(vectorstore, question, candidates)
+        else:
+            scored_docs, sub_queries = vectorstore.similarity_search_with_score(question, k=candidates), [question]
+        context, stats = pack_context(scored_docs, token_budget, ranked=len(sub_queries) > 1)
+        stats["sub_queries"] = len(sub_queries)
+        messages = prompt.format_messages(context=format_docs(context), input=question)
+        rendered_prompt = prompt.format(context=format_docs(context), input=question)
+        # The estimate only sizes the context; the real count comes from the LLM's usage metadata
+        stats["prompt_tokens_estimate"] = estimate_tokens(rendered_prompt)
+        stats["prompt_tokens"] = None
+
+        def generate():
+            # Called directly (not via a parser chain) so usage_metadata is kept
+            response = llm.invoke(messages)
+            return parser.invoke(response), getattr(response, "usage_metadata", None) or {}
+
+        try:
+            if scheduler is None:
+                answer, usage = generate()
+            else:
+                # Identical prompts in flight share one generation
+                answer, usage = scheduler.run(rendered_prompt, generate)
+            stats["prompt_tokens"] = usage.get("input_tokens")
+        except SchedulerBusy:
+            answer = BUSY_ANSWER
+            stats["shed"] = True
+        return {"input": question, "context": context, "answer": answer, "context_stats": stats}
+
+    return RunnableLambda(answer_question)
@@ -0,0 +1,69 @@
+# tests/test_answer_cache.py
+#
+# Freshness checks and lookups of the precomputed answer cache:
+#
+#     python -m pytest -q tests
+
+from rag_pipeline.answer_cache import AnswerCache, open_for_writing, normalize_question
+import json
+
+
+def write_cache(path, build_id):
+    conn = open_for_writing(str(path), build_id)
+    conn.execute(
+        "INSERT INTO answers (key, question, answer, context, prompt_tokens, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (normalize_question("Who directed Inception?"), "Who directed Inception?", "Christopher Nolan.",
+         json.dumps([{"score": 0.9, "chunk_ids": ["movies:1:0"]}]), 120, 0.0)
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_normalized_question_hits(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    write_cache(path, "build-1")
+    cache = AnswerCache.load(str(path), build_id_source=lambda: "build-1")
+
+    hit = cache.get("  who DIRECTED inception ")
+    assert hit["answer"] == "Christopher Nolan."
+    assert hit["context"] == [{"score": 0.9, "chunk_ids": ("movies:1:0",)}]
+    assert cache.get("Who directed Memento?") is None
+
+
+def test_rebuilt_index_is_noticed_without_reload(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    write_cache(path, "build-1")
+    live = {"build_id": "build-1"}
+    cache = AnswerCache.load(str(path), build_id_source=lambda: live["build_id"], check_interval_s=0)
+    assert cache.get("Who directed Inception?") is not None
+
+    live["build_id"] = "build-2"
+    assert cache.get("Who directed Inception?") is None
+
+    # Re-running the job for the new build drops the old answers and serves again
+    write_cache(path, "build-2")
+    assert len(cache) == 1
+    assert cache.get("Who directed Inception?") is not None
+
+
+def test_failing_build_id_source_answers_live(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    write_cache(path, "build-1")
+
+    def unreachable():
+        raise ConnectionError("pinecone unreachable")
+
+    cache = AnswerCache.load(str(path), build_id_source=unreachable)
+    assert cache.get("Who directed Inception?") is None
+
+
+def test_missing_empty_or_foreign_file_is_ignored(tmp_path):
+    assert AnswerCache.load(str(tmp_path / "missing.sqlite"), build_id_source=lambda: "b") is None
+
+    empty = tmp_path / "empty.sqlite"
+    empty.write_bytes(b"")
+    assert AnswerCache.load(str(empty), build_id_source=lambda: "b") is None
+
+    foreign = tmp_path / "foreign.sqlite"
+    foreign.write_text("not a database")
+    assert AnswerCache.load(str(foreign), build_id_source=lambda: "b") is None
@@ -0,0 +1,135 @@
+# tests/test_llm_scheduler.py
+#
+# Behaviour of the shared LLM scheduler against the benchmark's FakeLLM:
+#
+#     python -m pytest -q tests
+
+from concurrent.futures import ThreadPoolExecutor
+from rag_pipeline.llm_scheduler import LLMScheduler, SchedulerBusy
+from benchmarks.llm_scheduler_sim import FakeLLM
+import threading
+import time
+import pytest
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.005)
+
+
+def run_in_background(scheduler, key, fn):
+    """
+    Starts scheduler.run(key, fn) on a thread; returns the thread and a result dict.
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = scheduler.run(key, fn)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def test_identical_requests_share_one_generation():
+    llm = FakeLLM(latency_s=0.3)
+    scheduler = LLMScheduler(max_concurrency=4, max_queue=32, queue_timeout_s=5)
+    barrier = threading.Barrier(10)
+
+    def ask(_):
+        barrier.wait()
+        return scheduler.run("same prompt", lambda: llm.invoke("same prompt"))
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(ask, range(10)))
+
+    assert llm.calls == 1
+    assert set(results) == {"answer to: same prompt"}
+    metrics = scheduler.metrics()
+    assert metrics["coalesced"] == 9
+    assert metrics["completed"] == 1
+    assert metrics["in_flight_keys"] == 0
+
+
+def test_concurrency_is_capped():
+    llm = FakeLLM(latency_s=0.1)
+    scheduler = LLMScheduler(max_concurrency=2, max_queue=32, queue_timeout_s=5)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: scheduler.run(f"q{i}", lambda: llm.invoke(f"q{i}")), range(8)))
+
+    assert len(results) == 8
+    assert llm.calls == 8
+    assert llm.peak_concurrency == 2
+
+
+def test_request_is_shed_when_queue_is_full():
+    llm = FakeLLM(latency_s=0.5)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1, queue_timeout_s=5)
+
+    running, _ = run_in_background(scheduler, "a", lambda: llm.invoke("a"))
+    wait_until(lambda: scheduler.metrics()["running"] == 1)
+    waiting, waiting_outcome = run_in_background(scheduler, "b", lambda: llm.invoke("b"))
+    wait_until(lambda: scheduler.metrics()["queue_depth"] == 1)
+
+    with pytest.raises(SchedulerBusy):
+        scheduler.run("c", lambda: llm.invoke("c"))
+
+    running.join()
+    waiting.join()
+    assert waiting_outcome["result"] == "answer to: b"
+    assert scheduler.metrics()["shed_queue_full"] == 1
+    assert llm.calls == 2
+
+
+def test_request_is_shed_after_queue_deadline():
+    llm = FakeLLM(latency_s=0.5)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=8, queue_timeout_s=0.1)
+
+    running, _ = run_in_background(scheduler, "a", lambda: llm.invoke("a"))
+    wait_until(lambda: scheduler.metrics()["running"] == 1)
+
+    start = time.monotonic()
+    with pytest.raises(SchedulerBusy):
+        scheduler.run("b", lambda: llm.invoke("b"))
+    assert time.monotonic() - start < 0.4
+
+    running.join()
+    metrics = scheduler.metrics()
+    assert metrics["shed_deadline"] == 1
+    assert metrics["in_flight_keys"] == 0
+    assert llm.calls == 1
+
+
+def test_leader_exception_reaches_coalesced_followers():
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_generation():
+        started.set()
+        release.wait(5)
+        raise ValueError("groq unavailable")
+
+    scheduler = LLMScheduler(max_concurrency=2, max_queue=8, queue_timeout_s=5)
+    leader, leader_outcome = run_in_background(scheduler, "q", failing_generation)
+    started.wait(5)
+    follower, follower_outcome = run_in_background(scheduler, "q", failing_generation)
+    wait_until(lambda: scheduler.metrics()["coalesced"] == 1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert isinstance(leader_outcome["error"], ValueError)
+    assert isinstance(follower_outcome["error"], ValueError)
+    metrics = scheduler.metrics()
+    assert metrics["failed"] == 1
+    assert metrics["in_flight_keys"] == 0
+
+    # The failed key is not stuck: the next request runs a fresh generation
+    assert scheduler.run("q", lambda: "recovered") == "recovered"
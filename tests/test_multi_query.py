@@ -0,0 +1,53 @@
+# tests/test_multi_query.py
+#
+# Compound-question splitting and result fusion for multi-query retrieval:
+#
+#     python -m pytest -q tests
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document
+from rag_pipeline.multi_query import split_question, fuse_results
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Compare the directors of The Matrix and Inception", ["directors of The Matrix", "directors of Inception"]),
+    ("Who stars in Pulp Fiction, Heat and Memento?",
+     ["Who stars in Pulp Fiction", "Who stars in Heat", "Who stars in Memento"]),
+    ("The Godfather vs Blade Runner", ["The Godfather", "Blade Runner"]),
+    ("Which is older, Avatar or The Dark Knight?", ["Which is older Avatar", "Which is older The Dark Knight"]),
+    ("What is the difference between Alien and Aliens?", ["Alien", "Aliens"]),
+    ("Romeo and Juliet vs West Side Story", ["Romeo and Juliet", "West Side Story"]),
+    ('Compare "Romeo and Juliet" and "West Side Story"', ['"Romeo and Juliet"', '"West Side Story"']),
+])
+def test_compound_questions_are_split(question, expected):
+    assert split_question(question) == expected
+
+
+@pytest.mark.parametrize("question", [
+    "Who directed Romeo and Juliet?",
+    "Movies with Tom Hanks and Meg Ryan",
+    "How do Romeo and Juliet die?",
+    "Recommend action and drama movies",
+    "In Titanic, who plays Rose?",
+    "What is The Matrix about?",
+])
+def test_titles_names_and_simple_questions_are_kept_whole(question):
+    assert split_question(question) == [question]
+
+
+def hits(*names):
+    return [(Document(page_content=name, metadata={"chunk_id": name}), 1.0 - n / 10) for n, name in enumerate(names)]
+
+
+def test_every_reserved_list_keeps_its_best_hit():
+    whole = hits("a", "b", "c", "d")
+    first = hits("b", "c", "a")
+    second = hits("c", "b", "e")
+    fused = fuse_results([whole, first, second], k=3, reserved_lists=range(3))
+    assert [doc.metadata["chunk_id"] for doc, _ in fused] == ["a", "b", "c"]
+
+    # Without a reservation the whole question's best hit loses to the sub-queries' consensus
+    fused = fuse_results([whole, first, second], k=2, reserved_lists=range(1, 3))
+    assert [doc.metadata["chunk_id"] for doc, _ in fused] == ["b", "c"]
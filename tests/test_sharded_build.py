@@ -0,0 +1,114 @@
+# tests/test_sharded_build.py
+#
+# End-to-end sharded build on a fake corpus and a deterministic fake embedder,
+# with two nodes sharing one shard directory:
+#
+#     python -m pytest -q tests
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import functools
+import hashlib
+import zlib
+import os
+import numpy as np
+import pytest
+
+sharded_build = pytest.importorskip("Embeddings.sharded_build")
+from langchain_core.documents import Document
+
+ROWS_PER_SOURCE = 12
+NUM_SHARDS = 2
+DIMENSION = 8
+
+
+class FakeEmbeddings:
+    """
+    Same text, same vector, in any process.
+    """
+
+    def embed_documents(self, texts):
+        return [np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(DIMENSION).tolist()
+                for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def row_text(source, row_id):
+    # Unrelated hex words, so no two rows are near duplicates
+    return f"{source} {row_id}: " + " ".join(
+        hashlib.md5(f"{source}:{row_id}:{n}".encode("utf-8")).hexdigest() for n in range(4)
+    )
+
+
+def fake_document_batches(sources=None, bucket=None, num_buckets=None, **_):
+    for source in sources or sharded_build.SENTENCE_SOURCES:
+        yield [
+            Document(page_content=row_text(source, row_id), metadata={"source": source, "row_id": str(row_id)})
+            for row_id in range(ROWS_PER_SOURCE)
+            if not num_buckets or row_id % num_buckets == bucket
+        ]
+
+
+@pytest.fixture
+def fake_build(monkeypatch):
+    monkeypatch.setattr(sharded_build, "iter_document_batches", fake_document_batches)
+    monkeypatch.setattr(sharded_build, "create_embeddings", lambda backend=None: FakeEmbeddings())
+    # Forked workers inherit the patches above whatever the platform's default start method
+    monkeypatch.setattr(sharded_build, "ProcessPoolExecutor",
+                        functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context("fork")))
+
+
+def build_node(shard_dir, worker_id, num_shards=NUM_SHARDS):
+    return sharded_build.run_sharded_build(num_shards, workers=2, worker_id=worker_id, num_workers=2,
+                                           shard_dir=str(shard_dir), embedding_backend="torch")
+
+
+def test_two_nodes_build_and_merge(fake_build, tmp_path):
+    shard_dir = tmp_path / "shards"
+    all_shards = sharded_build.list_shards(NUM_SHARDS)
+
+    first = build_node(shard_dir, worker_id=0)
+    assert len(first) == len(all_shards[0::2])
+    # Half the shards are still missing, so merging must refuse
+    with pytest.raises(RuntimeError, match="not complete"):
+        sharded_build.merge_to_local(str(shard_dir), str(tmp_path / "index"))
+
+    second = build_node(shard_dir, worker_id=1)
+    assert {stats["shard"] for stats in first + second} == {name for name, _, _ in all_shards}
+    assert not any(stats["skipped"] for stats in first + second)
+
+    store = sharded_build.merge_to_local(str(shard_dir), str(tmp_path / "index"))
+    expected = len(sharded_build.SENTENCE_SOURCES) * ROWS_PER_SOURCE
+    assert sum(stats["chunks"] for stats in first + second) == expected
+    assert len(store.ids) == len(set(store.ids)) == expected
+    assert store.vectors.shape == (expected, DIMENSION)
+    assert np.allclose(np.linalg.norm(store.vectors, axis=1), 1.0)
+
+    # Vectors stay aligned with their text through the shard files and the merge
+    text = row_text("movies", 5)
+    chunk_id, hit_text, _, _ = sharded_build.LocalVectorStore.load(str(tmp_path / "index")).search(
+        FakeEmbeddings().embed_query(text), k=1)[0]
+    assert (chunk_id, hit_text) == ("movies:5:0", text)
+
+
+def test_rerun_skips_done_shards(fake_build, tmp_path):
+    shard_dir = tmp_path / "shards"
+    build_node(shard_dir, worker_id=0)
+    build_node(shard_dir, worker_id=1)
+    done_files = sorted(p for p in os.listdir(shard_dir) if p.endswith(".done"))
+    mtimes = [os.path.getmtime(shard_dir / p) for p in done_files]
+
+    assert build_node(shard_dir, worker_id=0) == []
+    assert build_node(shard_dir, worker_id=1) == []
+    assert [os.path.getmtime(shard_dir / p) for p in done_files] == mtimes
+
+
+def test_mismatched_shard_count_is_rejected(fake_build, tmp_path):
+    shard_dir = tmp_path / "shards"
+    build_node(shard_dir, worker_id=0)
+
+    with pytest.raises(ValueError, match=f"--num-shards {NUM_SHARDS}"):
+        build_node(shard_dir, worker_id=1, num_shards=NUM_SHARDS + 1)
+    assert not any(p.endswith(f"-of-{NUM_SHARDS + 1:03d}.done") for p in os.listdir(shard_dir))